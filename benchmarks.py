@@ -0,0 +1,266 @@
+"""Headless micro-benchmarks for the pathfinding and distance primitives in my_team.
+
+Runs on generated layouts of several sizes and wall densities, without a contest game: the interpreter gets a
+stub GameData and a DistanceTable built straight from the generated walls instead of the contest distancer.
+
+    python benchmarks.py --sizes 32x16,64x32 --densities 0.2,0.35 --output bench.json
+    python benchmarks.py --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from collections import deque
+
+import my_team
+from my_team import DistanceTable, GameInterpreter, GameSimulator, MapModel, Position, PositionPath, RedAgentColor, SimulatorState
+
+
+class BenchmarkWalls:
+    """Stand-in for the contest wall Grid: width, height and walls[x][y]."""
+
+    def __init__(self, width, height, density, seed):
+        rng = random.Random(seed)
+        self.width = width
+        self.height = height
+        self.data = [[x in (0, width - 1) or y in (0, height - 1) for y in range(height)] for x in range(width)]
+
+        # Point-symmetric like the contest layouts, so both halves are equally hard
+        for x in range(1, width // 2):
+            for y in range(1, height - 1):
+                if rng.random() < density:
+                    self.data[x][y] = True
+                    self.data[width - 1 - x][height - 1 - y] = True
+
+        self._keep_largest_region()
+
+    def __getitem__(self, x):
+        return self.data[x]
+
+    def _keep_largest_region(self):
+        seen = set()
+        largest = set()
+
+        for x in range(self.width):
+            for y in range(self.height):
+                if self.data[x][y] or (x, y) in seen:
+                    continue
+
+                region = {(x, y)}
+                queue = deque([(x, y)])
+                while queue:
+                    cx, cy = queue.popleft()
+                    for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+                        if not self.data[nx][ny] and (nx, ny) not in region:
+                            region.add((nx, ny))
+                            queue.append((nx, ny))
+
+                seen |= region
+                if len(region) > len(largest):
+                    largest = region
+
+        for x in range(self.width):
+            for y in range(self.height):
+                if (x, y) not in largest:
+                    self.data[x][y] = True
+
+
+class BenchmarkGameData:
+    """Only the GameData fields the benchmarked primitives read."""
+
+    def __init__(self, map_model, current_position):
+        self.map_model = map_model
+        self.budget = None
+        self.game_state = None
+        self.agent_color = RedAgentColor("red", map_model)
+        self.current_position = current_position
+        self.food_positions = []
+        self.enemies = []
+        self.capsules = []
+
+
+class BenchmarkGameState:
+    """Only what GameSimulator reads from a game state: two agents per team spawning in opposite corners."""
+
+    def __init__(self, cells):
+        self.spawns = [cells[0].to_tuple(), cells[-1].to_tuple(), cells[1].to_tuple(), cells[-2].to_tuple()]
+
+    def get_num_agents(self):
+        return len(self.spawns)
+
+    def is_on_red_team(self, index):
+        return index % 2 == 0
+
+    def get_initial_agent_position(self, index):
+        return self.spawns[index]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def measure(operation, arguments):
+    latencies = []
+    started = time.perf_counter()
+
+    for argument in arguments:
+        operation_started = time.perf_counter()
+        operation(argument)
+        latencies.append(time.perf_counter() - operation_started)
+
+    total = time.perf_counter() - started
+    latencies.sort()
+
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": round(len(latencies) / total, 1),
+        "p50_us": round(percentile(latencies, 0.50) * 1_000_000, 2),
+        "p95_us": round(percentile(latencies, 0.95) * 1_000_000, 2),
+        "p99_us": round(percentile(latencies, 0.99) * 1_000_000, 2),
+        "max_us": round(latencies[-1] * 1_000_000, 2)
+    }
+
+
+def benchmark_layout(width, height, density, iterations, seed):
+    rng = random.Random(seed)
+
+    started = time.perf_counter()
+    map_model = MapModel(BenchmarkWalls(width, height, density, seed))
+    map_model_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    distances = DistanceTable(map_model)
+    distances_seconds = time.perf_counter() - started
+
+    cells = map_model.open_cells
+    interpreter = GameInterpreter(0, None)
+    interpreter.map_model = map_model
+    interpreter.distances = distances
+    interpreter.game_data = BenchmarkGameData(map_model, cells[0])
+
+    enemy_side = [position for position in cells if not interpreter.game_data.agent_color.is_position_on_safe_side(position)]
+    home_border = interpreter.game_data.agent_color.border_x
+
+    pairs = [(rng.choice(cells), rng.choice(cells), [rng.choice(cells)]) for _ in range(iterations)]
+    flee_starts = [rng.choice(enemy_side) for _ in range(iterations)]
+
+    def position_path(argument):
+        starting, ending, restricted = argument
+        PositionPath(interpreter.game_data, starting, ending, restricted)
+
+    def closest_safe_position(starting):
+        interpreter.last_safe_position = Position(home_border, rng.randrange(height))
+        interpreter.game_data.current_position = starting
+        interpreter.get_closest_safe_position(starting)
+
+    def empty_spaces(_):
+        interpreter.get_empty_spaces(min_x=home_border - 4, max_x=home_border)
+
+    def random_treshold_position(starting):
+        interpreter.get_random_treshold_position(interpreter.game_data, starting, (home_border - 4, home_border), 1_000)
+
+    def distance(argument):
+        starting, ending, _ = argument
+        interpreter.get_distance(starting, ending)
+
+    simulator = GameSimulator(map_model, BenchmarkGameState(cells))
+    food = sum(1 << cell for cell in range(len(cells)) if rng.random() < 0.3)
+    state = SimulatorState(list(simulator.spawns), [0] * 4, [0] * 4, food, 0, 0)
+    moves = [[rng.randrange(5) for _ in range(12)] for _ in range(iterations)]
+
+    def simulate(choices):
+        # A 12 ply line through all four agents, then undone back to the start
+        records = []
+        for ply, choice in enumerate(choices):
+            legal = simulator.legal_moves(state, ply % 4)
+            records.append(simulator.apply(state, ply % 4, legal[choice % len(legal)]))
+
+        for record in reversed(records):
+            simulator.undo(state, record)
+
+    return {
+        "layout": {"width": width, "height": height, "density": density, "open_cells": len(cells), "seed": seed},
+        "setup_ms": {"map_model": round(map_model_seconds * 1000, 2), "distance_table": round(distances_seconds * 1000, 2)},
+        "primitives": {
+            "PositionPath": measure(position_path, pairs),
+            "get_closest_safe_position": measure(closest_safe_position, flee_starts),
+            "get_empty_spaces": measure(empty_spaces, range(iterations)),
+            "get_random_treshold_position": measure(random_treshold_position, flee_starts),
+            "get_distance": measure(distance, pairs),
+            "GameSimulator 12 plies": measure(simulate, moves)
+        }
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(my_team.__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline_layouts = {}
+    if baseline is not None:
+        for layout_result in baseline["layouts"]:
+            layout = layout_result["layout"]
+            baseline_layouts[(layout["width"], layout["height"], layout["density"])] = layout_result
+
+    for layout_result in results["layouts"]:
+        layout = layout_result["layout"]
+        key = (layout["width"], layout["height"], layout["density"])
+        print(f"{layout['width']}x{layout['height']} density={layout['density']} open={layout['open_cells']} setup={layout_result['setup_ms']}")
+
+        for name, stats in layout_result["primitives"].items():
+            line = f"  {name:<30} {stats['ops_per_sec']:>12.1f} ops/s  p50={stats['p50_us']:>9.2f}us  p95={stats['p95_us']:>9.2f}us  p99={stats['p99_us']:>9.2f}us"
+
+            previous = baseline_layouts.get(key, {}).get("primitives", {}).get(name)
+            if previous is not None and previous["ops_per_sec"]:
+                line += f"  ({stats['ops_per_sec'] / previous['ops_per_sec']:.2f}x vs {baseline.get('revision')})"
+
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="32x16,48x24,64x32", help="comma separated WIDTHxHEIGHT layouts")
+    parser.add_argument("--densities", default="0.2,0.35", help="comma separated wall densities")
+    parser.add_argument("--iterations", type=int, default=500, help="operations per primitive and layout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    arguments = parser.parse_args()
+
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "layouts": []
+    }
+
+    for size in arguments.sizes.split(","):
+        width, height = (int(value) for value in size.lower().split("x"))
+        for density in arguments.densities.split(","):
+            results["layouts"].append(benchmark_layout(width, height, float(density), arguments.iterations, arguments.seed))
+
+    baseline = None
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+
+    print_results(results, baseline)
+
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
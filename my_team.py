@@ -1,19 +1,70 @@
+import hashlib
 import heapq
+import json
+import math
+import mmap
+import multiprocessing
+import os
 import random
+import struct
+import sys
+import tempfile
 import time
-from collections import defaultdict
+from array import array
+from collections import Counter, OrderedDict, defaultdict, deque
 from enum import Enum, auto
+from functools import cached_property
 from typing import override
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from contest.capture_agents import CaptureAgent
 from contest.graphics_utils import circle, format_color
 
 
-def create_team(first_index, second_index, is_red, first='CustomUniversalAgent', second='CustomUniversalAgent', num_training=1):
+def create_team(first_index, second_index, is_red, first='CustomUniversalAgent', second='CustomUniversalAgent', num_training=1, telemetry='0', telemetry_path='telemetry.jsonl', first_decision='rules', second_decision='rules', warm_routes='0'):
     # print("Agent 1: ", first_index, " Type: ", first)
     # print("Agent 2: ", second_index, " Type: ", second)
 
-    return [eval(first)(first_index, 0, is_red), eval(second)(second_index, 1, is_red)]
+    agents = [eval(first)(first_index, 0, is_red), eval(second)(second_index, 1, is_red)]
+
+    knowledge = TeamKnowledge()
+    for agent in agents:
+        if isinstance(agent, CustomUniversalAgent):
+            agent.knowledge = knowledge
+
+    if is_option_enabled(telemetry):
+        for agent in agents:
+            if isinstance(agent, CustomUniversalAgent):
+                agent.telemetry = Telemetry(telemetry_path)
+
+    if is_option_enabled(warm_routes):
+        for agent in agents:
+            if isinstance(agent, CustomUniversalAgent):
+                agent.warm_routes = True
+
+    # "rules" keeps the goal interpreter, "mcts" decides by Monte Carlo tree search
+    for agent, decision in zip(agents, (first_decision, second_decision)):
+        if isinstance(agent, CustomUniversalAgent) and decision.strip().lower() == "mcts":
+            agent.search = MonteCarloSearch(agent)
+
+    return agents
+
+
+def is_red_side(x, width):
+    # The contest's own side rule: columns left of the middle belong to red
+    return x < width // 2
+
+
+def is_option_enabled(value):
+    # Team options arrive as strings from the command line
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    return bool(value)
 
 
 class DummyAgent(CaptureAgent):
@@ -29,94 +80,683 @@ class DummyAgent(CaptureAgent):
 
 
 class CustomUniversalAgent(CaptureAgent):
-    mapped_moves = defaultdict(list)
-    execution_time = defaultdict(list)
-    mapped_decisions = defaultdict(list)
 
     def __init__(self, index, agent_index, is_red, time_for_computing=.1):
         super().__init__(index, time_for_computing)
         self.agent_index = agent_index
         self.is_red = is_red
+        self.turn_budget = time_for_computing
         self.start = None
         self.move_count = 0
+        self.map_model = None
+        self.snapshot = None
+        self.telemetry = None
+        self.search = None
+        self.knowledge = None
+        self.warm_routes = False
+        self.route_warmer = None
         self.interpreter = GameInterpreter(agent_index, self)
 
     def final(self, game_state):
-        return
-        # print("Agent ", self.agent_index, " made ", self.move_count, " moves, Average move time: %.7f" % (sum(CustomUniversalAgent.execution_time[self.agent_index]) / self.move_count),
-        #       ", Longest Move: %.7f" % (max(CustomUniversalAgent.execution_time[self.agent_index])))
-        # print("Mapped Moves:", CustomUniversalAgent.mapped_moves[self.agent_index])
-        # print("Mapped Decisions", CustomUniversalAgent.mapped_decisions[self.agent_index])
+        if self.route_warmer is not None:
+            self.route_warmer.close()
+            self.route_warmer = None
+
+        if PROFILER is not None:
+            PROFILER.report()
+
+        if self.telemetry is None:
+            return
+
+        self.telemetry.write_report(self, game_state)
 
     def register_initial_state(self, game_state):
+        if self.telemetry is not None:
+            self.telemetry.reset()
+
+        if PROFILER is not None:
+            PROFILER.game_started()
+
         self.start = game_state.get_agent_position(self.index)
         CaptureAgent.register_initial_state(self, game_state)
 
+        if self.knowledge is None:
+            self.knowledge = TeamKnowledge()
+        self.knowledge.register(self, game_state)
+
+        # Agents are reused across the games of a match, and the interpreter's planners, routes and fields
+        # belong to the previous layout, so every game starts from a fresh one
+        self.move_count = 0
+        self.map_model = self.knowledge.map_model
+        self.interpreter = GameInterpreter(self.agent_index, self)
+        self.interpreter.knowledge = self.knowledge
+        self.interpreter.map_model = self.map_model
+        self.interpreter.distances = self.knowledge.distances
+        self.interpreter.topology = self.knowledge.topology
+        self.interpreter.retreat_directions = self.knowledge.retreat_directions
+        self.interpreter.beliefs = self.knowledge.beliefs
+        if PROFILER is not None and self.interpreter.collects_food:
+            PROFILER.instrument(self.interpreter.food_route, "food_route", ("plan", "path_from"))
+
+        self.snapshot = GameSnapshot(self, self.map_model)
+
+        if self.search is not None:
+            self.search.reset(game_state)
+
+        if self.route_warmer is not None:
+            self.route_warmer.close()
+            self.route_warmer = None
+
+        # Only agents that collect food keep a route to warm, and in search mode nobody reads it
+        if self.warm_routes and self.search is None and self.interpreter.collects_food:
+            self.route_warmer = RouteWarmer.start(self.interpreter.food_route)
+            self.interpreter.food_route.warmer = self.route_warmer
+
     def choose_action(self, game_state):
-        start = time.time()
+        budget = TurnBudget(self.turn_budget)
+        if PROFILER is not None:
+            PROFILER.enter(f"{'red' if self.is_red else 'blue'}_{self.agent_index}")
+
         actions = game_state.get_legal_actions(self.index)
 
-        next_move = self.interpreter.compute_next_move(GameData(
-            self.is_red,
+        events = self.snapshot.update(game_state)
+        if self.interpreter.beliefs is not None:
+            team = [self.index] + [index for index in self.get_team(game_state) if index != self.index]
+            self.interpreter.beliefs.update(game_state, [game_state.get_agent_position(index) for index in team], self.index)
+
+        game_data = GameData(
+            self.snapshot,
+            events,
+            budget,
             actions,
             game_state,
-            self.get_food(game_state).as_list(),
             game_state.get_agent_position(self.index),
-            game_state.get_agent_state(self.index),
-            [
-                {
-                    "pos": s.get_position(),
-                    "isPacman": s.is_pacman,
-                    "scaredTimer": s.scared_timer
-                }
-                for s in [game_state.get_agent_state(i) for i in self.get_opponents(game_state)]
-            ],
-            game_state.get_capsules(),
-            game_state.get_walls().as_list()
-        ))
+            game_state.get_agent_state(self.index)
+        )
+
+        if self.search is not None:
+            self.interpreter.food_index.apply(events)
+            next_move = self.search.choose(game_data)
+        else:
+            next_move = self.interpreter.compute_next_move(game_data)
 
         if next_move is None:
-            actual_move = random.choice(actions)
+            fallback_move = self.interpreter.get_fallback_move(actions) if self.search is None else None
+            actual_move = random.choice(actions) if fallback_move is None else fallback_move.__str__()
         else:
             actual_move = next_move.__str__().strip()
 
         self.move_count += 1
-        CustomUniversalAgent.mapped_moves[self.agent_index].append(actual_move)
-        CustomUniversalAgent.execution_time[self.agent_index].append(time.time() - start)
+        if PROFILER is not None:
+            PROFILER.exit()
+
+        if self.telemetry is not None:
+            self.telemetry.record(actual_move, budget.elapsed(), self.interpreter)
+
+        if self.route_warmer is not None:
+            self.route_warmer.submit(self.interpreter.get_likely_replans())
+
         return actual_move
 
+
+class LatencyHistogram:
+    """Streaming latency aggregate over logarithmic buckets, so percentiles need constant memory."""
+
+    GROWTH = 1.05
+    BUCKETS = 400  # 1 microsecond up to roughly 5 minutes
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        microseconds = max(seconds * 1_000_000, 1.0)
+        bucket = min(int(math.log(microseconds, self.GROWTH)), self.BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, fraction):
+        if self.count == 0:
+            return 0.0
+
+        rank = fraction * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                # Upper bound of the bucket, never above the largest value actually seen
+                return min(self.GROWTH ** (bucket + 1) / 1_000_000, self.maximum)
+
+        return self.maximum
+
+    def merge(self, other):
+        for bucket, bucket_count in enumerate(other.counts):
+            self.counts[bucket] += bucket_count
+
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def to_state(self):
+        # Sparse buckets, so histograms from separate games or processes can be merged exactly
+        return {
+            "buckets": {bucket: bucket_count for bucket, bucket_count in enumerate(self.counts) if bucket_count},
+            "total": self.total,
+            "maximum": self.maximum
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        histogram = cls()
+        for bucket, bucket_count in state["buckets"].items():
+            histogram.counts[int(bucket)] = bucket_count
+            histogram.count += bucket_count
+
+        histogram.total = state["total"]
+        histogram.maximum = state["maximum"]
+        return histogram
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 4) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 4),
+            "p95_ms": round(self.percentile(0.95) * 1000, 4),
+            "p99_ms": round(self.percentile(0.99) * 1000, 4),
+            "max_ms": round(self.maximum * 1000, 4)
+        }
+
+
+class Telemetry:
+    """Opt-in per-agent turn telemetry with fixed memory, reset at the start of every game."""
+
+    RECENT_TURNS = 64
+
+    def __init__(self, path):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.latency = LatencyHistogram()
+        self.recent = deque(maxlen=self.RECENT_TURNS)
+        self.moves = Counter()
+        self.states = Counter()
+        self.decisions = Counter()
+
+    def record(self, move, seconds, interpreter):
+        self.latency.add(seconds)
+        self.moves[move] += 1
+        self.states[interpreter.game_state.name] += 1
+        self.recent.append((move, interpreter.game_state.name, round(seconds * 1000, 3)))
+
+        for goal, result in interpreter.last_decisions.items():
+            self.decisions[f"{goal.__name__}: {result}"] += 1
+
+    def write_report(self, agent, game_state):
+        report = {
+            "agent": agent.agent_index,
+            "index": agent.index,
+            "red": agent.is_red,
+            "score": agent.get_score(game_state),
+            "latency": self.latency.summary(),
+            "latency_histogram": self.latency.to_state(),
+            "moves": dict(self.moves),
+            "states": dict(self.states),
+            "decisions": dict(self.decisions),
+            "scheduler": agent.interpreter.scheduler.report(),
+            "search": agent.search.report() if agent.search is not None else None,
+            "recent": list(self.recent)
+        }
+
+        try:
+            with open(self.path, "a") as file:
+                file.write(json.dumps(report, separators=(",", ":")) + "\n")
+        except OSError:
+            pass
+
+class Profiler:
+    """Hot-path instrumentation, enabled with PACLERS_PROFILE=1 and free when off (PROFILER stays None).
+
+    Timed sections form a stack whose self times are kept in collapsed-stack form, the input format of
+    flamegraph.pl, inferno and speedscope; PACLERS_PROFILE_TRACE names the file they are written to. The summary
+    and the trace cover one game, as the contest reuses the process for every game of a match.
+    """
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.counters = Counter()
+        self.goal_times = defaultdict(LatencyHistogram)
+        self.searches = defaultdict(lambda: {"calls": 0, "expanded": 0, "path_length": 0, "partial": 0})
+        self.paths = defaultdict(lambda: {"calls": 0, "expanded": 0, "path_length": 0})
+        self.folded = Counter()
+        self.stack = []
+        self.reported = False
+
+    def game_started(self):
+        # Every agent calls this as a game starts; the first call after a report drops the previous game's data
+        if not self.reported:
+            return
+
+        self.counters.clear()
+        self.goal_times.clear()
+        self.searches.clear()
+        self.paths.clear()
+        self.folded.clear()
+        self.stack.clear()
+        self.reported = False
+
+    def enter(self, name):
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, started, children = self.stack.pop()
+        elapsed = time.perf_counter() - started
+        self.folded[";".join([frame[0] for frame in self.stack] + [name])] += elapsed - children
+
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+        return elapsed
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def instrument(self, target, prefix, method_names):
+        for method_name in method_names:
+            setattr(target, method_name, self._counted(f"{prefix}.{method_name}", getattr(target, method_name)))
+
+    def _counted(self, name, method):
+        counters = self.counters
+
+        def counted(*args, **kwargs):
+            counters[name] += 1
+            return method(*args, **kwargs)
+
+        return counted
+
+    def record_search(self, path):
+        stats = self.searches[path.search]
+        stats["calls"] += 1
+        stats["expanded"] += path.expanded
+        stats["path_length"] += path.needed_steps
+        stats["partial"] += path.partial
+
+    def record_path(self, reason, path):
+        stats = self.paths[f"{path.search}: {reason}"]
+        stats["calls"] += 1
+        stats["expanded"] += path.expanded
+        stats["path_length"] += path.needed_steps
+
+    def summary(self):
+        hit_rates = {}
+        for name in self.counters:
+            if name.endswith(".hit") or name.endswith(".miss"):
+                prefix = name.rsplit(".", 1)[0]
+                hits = self.counters.get(prefix + ".hit", 0)
+                hit_rates[prefix] = round(hits / (hits + self.counters.get(prefix + ".miss", 0)), 4)
+
+        return {
+            "goals": {name: histogram.summary() for name, histogram in self.goal_times.items()},
+            "searches": dict(self.searches),
+            "paths_by_reason": dict(self.paths),
+            "counters": dict(self.counters),
+            "hit_rates": hit_rates
+        }
+
+    def report(self):
+        # Every agent's final() asks, but the counters are process-wide, so one summary per game is enough
+        if self.reported:
+            return
+
+        self.reported = True
+        print(json.dumps(self.summary(), indent=2))
+
+        if self.trace_path is None:
+            return
+
+        try:
+            with open(self.trace_path, "w") as file:
+                for stack, seconds in sorted(self.folded.items()):
+                    file.write(f"{stack} {max(int(seconds * 1_000_000), 1)}\n")
+        except OSError:
+            pass
+
+
+class TurnBudget:
+    """Wall-clock deadline for a single choose_action call, shared by every planner that runs during it."""
+
+    def __init__(self, seconds):
+        self.started = time.perf_counter()
+        self.deadline = self.started + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def remaining(self):
+        return self.deadline - time.perf_counter()
+
+    def expired(self):
+        return time.perf_counter() >= self.deadline
+
+
+class TeamKnowledge:
+    """Per-layout precomputation and enemy beliefs shared by the agents of one team.
+
+    create_team hands both agents the same instance and whichever registers first builds it. An agent registering
+    a second time means a new game has started, so the map, distances, topology and beliefs are rebuilt from its
+    walls. The agents rebuild their own interpreters.
+    """
+
+    def __init__(self):
+        self.registered = set()
+        self.map_model = None
+        self.distances = None
+        self.topology = None
+        self.food_index = None
+        self.retreat_directions = None
+        self.beliefs = None
+
+    def register(self, agent, game_state):
+        if self.map_model is None or agent.index in self.registered:
+            self.registered.clear()
+            self.build(agent, game_state)
+
+        self.registered.add(agent.index)
+
+    def build(self, agent, game_state):
+        self.map_model = MapModel(game_state.get_walls())
+        self.distances = LAYOUT_CACHE.get_distance_table(self.map_model)
+        self.topology = MapTopology(self.map_model)
+        self.food_index = FoodIndex(self.map_model, self.distances)
+
+        if agent.is_red:
+            agent_color = RedAgentColor("red", self.map_model)
+        else:
+            agent_color = BlueAgentColor("blue", self.map_model)
+
+        self.retreat_directions = self._build_retreat_directions(agent_color)
+        self.beliefs = None
+
+        if np is not None:
+            spawns = {index: game_state.get_initial_agent_position(index) for index in agent.get_opponents(game_state)}
+            self.beliefs = BeliefTracker(self.map_model, self.distances, spawns, agent_color)
+
+        if PROFILER is not None:
+            PROFILER.instrument(self.distances, "distance", ("get_distance", "get_distances"))
+            PROFILER.instrument(self.food_index, "food_index", ("nearest", "path_from"))
+            if self.beliefs is not None:
+                PROFILER.instrument(self.beliefs, "beliefs", ("update",))
+
+    def _build_retreat_directions(self, agent_color):
+        """For every open cell, the direction that gets closest to our own side fastest (STOP once there)."""
+        map_model = self.map_model
+        field = [DistanceTable.UNREACHABLE] * len(map_model.open_cells)
+        frontier = [cell for cell, position in enumerate(map_model.open_cells) if agent_color.is_position_on_safe_side(position)]
+
+        for cell in frontier:
+            field[cell] = 0
+
+        while frontier:
+            next_frontier = []
+            for cell in frontier:
+                for neighbor in map_model.adjacency[cell]:
+                    if field[neighbor] == DistanceTable.UNREACHABLE:
+                        field[neighbor] = field[cell] + 1
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        directions = []
+        for cell, position in enumerate(map_model.open_cells):
+            if field[cell] == 0 or not map_model.adjacency[cell]:
+                directions.append(Direction.STOP)
+                continue
+
+            closest = min(map_model.adjacency[cell], key=field.__getitem__)
+            directions.append(Direction.from_position(position, map_model.open_cells[closest]))
+
+        return directions
+
+
+class GameSnapshot:
+    """Game facts carried over between turns. Each update applies only what changed and reports it as events.
+
+    Lists that change are replaced rather than mutated, so a previous turn's GameData keeps seeing its own values.
+    """
+
+    def __init__(self, agent, map_model):
+        self.agent = agent
+        self.map_model = map_model
+        self.opponents = None
+        self.food_positions = []
+        self.capsule_positions = []
+        self.capsules = []
+        self.enemies = []
+        self.enemy_keys = []
+
+        if agent.is_red:
+            self.agent_color = RedAgentColor("red", map_model)
+        else:
+            self.agent_color = BlueAgentColor("blue", map_model)
+
+    def update(self, game_state):
+        events = []
+
+        food_positions = self.agent.get_food(game_state).as_list()
+        if food_positions != self.food_positions:
+            previous_food = set(self.food_positions)
+            current_food = set(food_positions)
+            events.extend((ChangeEvent.FOOD_REMOVED, food) for food in previous_food - current_food)
+            events.extend((ChangeEvent.FOOD_ADDED, food) for food in current_food - previous_food)
+            self.food_positions = food_positions
+
+        capsule_positions = game_state.get_capsules()
+        if capsule_positions != self.capsule_positions:
+            events.extend((ChangeEvent.CAPSULE_REMOVED, capsule) for capsule in self.capsule_positions if capsule not in capsule_positions)
+            events.extend((ChangeEvent.CAPSULE_ADDED, capsule) for capsule in capsule_positions if capsule not in self.capsule_positions)
+            self.capsule_positions = capsule_positions
+            self.capsules = [
+                Capsule(Position.from_tuple(capsule))
+                for capsule in capsule_positions
+                if not self.agent_color.is_position_on_safe_side(Position.from_tuple(capsule))
+            ]
+
+        if self.opponents is None:
+            self.opponents = self.agent.get_opponents(game_state)
+            self.enemy_keys = [None] * len(self.opponents)
+            self.enemies = [None] * len(self.opponents)
+
+        enemies = None
+        for slot, index in enumerate(self.opponents):
+            state = game_state.get_agent_state(index)
+            key = (state.get_position(), state.is_pacman, state.scared_timer)
+            previous_key = self.enemy_keys[slot]
+
+            if key == previous_key:
+                continue
+
+            if previous_key is None or key[0] != previous_key[0]:
+                events.append((ChangeEvent.ENEMY_MOVED, (index, None if previous_key is None else previous_key[0], key[0])))
+
+            if previous_key is None or key[2] != previous_key[2]:
+                events.append((ChangeEvent.ENEMY_SCARED_CHANGED, (index, key[2])))
+
+            if enemies is None:
+                enemies = list(self.enemies)
+
+            self.enemy_keys[slot] = key
+            enemies[slot] = {
+                "index": index,
+                "pos": key[0],
+                "isPacman": key[1],
+                "scaredTimer": key[2]
+            }
+
+        if enemies is not None:
+            self.enemies = enemies
+
+        return events
+
+
 class GameData:
 
-    def __init__(self, is_red, legal_moves, game_state, food_positions, current_position, agent_state, enemies, capsules, walls):
+    def __init__(self, snapshot, events, budget, legal_moves, game_state, current_position, agent_state):
         self.legal_moves = legal_moves
         self.game_state = game_state
-        self.food_positions = food_positions
+        self.events = events
+        self.budget = budget
+        self.food_positions = snapshot.food_positions
         self.current_position = Position.from_tuple(current_position)
         self.is_pacman = agent_state.is_pacman
         self.is_scared = agent_state.scared_timer > 0
-        self.enemies = enemies
-        self.walls = walls
-        self.capsules = []
+        self.enemies = snapshot.enemies
+        self.map_model = snapshot.map_model
+        self.agent_color = snapshot.agent_color
+        self.capsules = snapshot.capsules
 
-        if is_red:
-            self.agent_color = RedAgentColor("red")
-        else:
-            self.agent_color = BlueAgentColor("blue")
 
-        for capsule in capsules:
-            capsule_position = Position.from_tuple(capsule)
+class TurnContext:
+    """Facts derived from one turn's GameData, each computed on first use and then shared by every goal.
+
+    The interpreter replaces its context at the start of every turn, so nothing cached here outlives the turn it
+    was computed in. GameData holds no reference back, so a finished turn's data is freed as soon as it is replaced.
+    """
+
+    def __init__(self, interpreter, game_data):
+        self.interpreter = interpreter
+        self.game_data = game_data
+
+    @cached_property
+    def is_current_position_safe(self):
+        return self.interpreter.is_position_safe(self.game_data.current_position)
+
+    @cached_property
+    def visible_enemies(self):
+        current_position = self.game_data.current_position
+        visible = []
+
+        for enemy in self.game_data.enemies:
+            if enemy["pos"] is None:
+                continue
+
+            enemy_position = Position.from_tuple(enemy["pos"])
+            visible.append((enemy, enemy_position, self.interpreter.get_distance(current_position, enemy_position)))
+
+        visible.sort(key=lambda item: item[2])
+        return visible
+
+    # Visible enemies in attacker territory (other), closest first, as (enemy, distance)
+    @cached_property
+    def defensive_enemies(self):
+        return [(enemy, distance) for enemy, position, distance in self.visible_enemies if not self.interpreter.is_position_safe(position)]
+
+    # Visible enemies in home territory (self), closest first, as (enemy, distance)
+    @cached_property
+    def offensive_enemies(self):
+        return [(enemy, distance) for enemy, position, distance in self.visible_enemies if self.interpreter.is_position_safe(position)]
+
+    @cached_property
+    def closest_food(self):
+        return self.interpreter.get_closest_food(self.game_data.current_position)
+
+    @cached_property
+    def closest_capsule(self):
+        current_position = self.game_data.current_position
+        capsules = [capsule for capsule in self.interpreter.capsules if not capsule.consumed and capsule.position is not None]
+
+        if not capsules:
+            return None
+
+        distances = self.interpreter.get_distances(current_position, [capsule.position for capsule in capsules])
+        closest_index = min(range(len(capsules)), key=distances.__getitem__)
+        return capsules[closest_index], distances[closest_index]
+
+    # Visible enemy ghosts that are not scared for long enough to ignore
+    @cached_property
+    def threatening_ghosts(self):
+        return [
+            position
+            for enemy, position, _ in self.visible_enemies
+            if not self.interpreter.is_position_safe(position) and DangerField.get_weight(enemy["scaredTimer"]) > 0
+        ]
+
+    # Most likely cell of the unseen enemy pacman that is most probably on our side, None without a confident one
+    @cached_property
+    def likely_invader(self):
+        beliefs = self.interpreter.beliefs
+        if beliefs is None:
+            return None
 
-            if self.agent_color.is_position_on_safe_side(capsule_position):
+        best = None
+        best_mass = BeliefTracker.CONFIDENT_MASS
+        for enemy in self.game_data.enemies:
+            if enemy["pos"] is not None or not enemy["isPacman"]:
                 continue
 
-            self.capsules.append(Capsule(capsule_position))
+            mass = beliefs.home_side_mass(enemy["index"])
+            position, _ = beliefs.most_likely(enemy["index"])
+            if mass >= best_mass and self.interpreter.is_position_safe(position):
+                best = position
+                best_mass = mass
+
+        return best
+
+    # Expected number of unseen, unscared enemy ghosts close enough to cut us off
+    @cached_property
+    def hidden_danger(self):
+        beliefs = self.interpreter.beliefs
+        if beliefs is None:
+            return 0.0
+
+        hidden_ghosts = [
+            enemy["index"]
+            for enemy in self.game_data.enemies
+            if enemy["pos"] is None and not enemy["isPacman"] and DangerField.get_weight(enemy["scaredTimer"]) > 0
+        ]
+        if not hidden_ghosts:
+            return 0.0
+
+        return beliefs.danger_mass(self.game_data.current_position, BeliefTracker.DANGER_RADIUS, hidden_ghosts)
+
+    # Extra step costs around the enemies that can eat us right now, None when there are none
+    @cached_property
+    def danger_costs(self):
+        threats = []
+        for enemy, position, _ in self.visible_enemies:
+            if self.interpreter.is_position_safe(position):
+                # Enemy pacmen on our side can only eat us while we are scared
+                threats.append((position, 1.0 if self.game_data.is_scared else 0.0))
+            else:
+                threats.append((position, DangerField.get_weight(enemy["scaredTimer"])))
+
+        return self.interpreter.danger_field.compute(threats)
+
+    @cached_property
+    def closest_safe_path(self):
+        return self.interpreter.get_closest_safe_position(self.game_data.current_position)
+
+
+class ProfiledTurnContext(TurnContext):
+    """TurnContext that reports cache hits and misses to the profiler; only used while profiling."""
+
+    def __getattribute__(self, name):
+        if isinstance(getattr(TurnContext, name, None), cached_property):
+            PROFILER.count(f"context.{name}.{'hit' if name in object.__getattribute__(self, '__dict__') else 'miss'}")
+
+        return object.__getattribute__(self, name)
+
 
 class Capsule:
 
+    ACTIVE_TIME = 40
+
     def __init__(self, position):
         self.consumed = False
         self.position = None
-        self.capsule_active_time = 40
+        self.capsule_active_time = self.ACTIVE_TIME
         self.position = position
 
     def eat_capsule(self, interpreter):
@@ -132,9 +772,24 @@ class Capsule:
             self.position = None
 
 class AgentColor:
+    """Side dependent geometry, derived from the layout size so any maze width works.
+
+    Bands keep the proportions of the standard 32 wide layout, where they were originally tuned. border_x is the
+    last column on our own side, by the same is_red_side rule the contest and GameSimulator use.
+    """
 
-    def __init__(self, color):
+    def __init__(self, color, map_model):
         self.color = color
+        self.width = map_model.width
+        self.height = map_model.height
+        self.middle = map_model.width // 2
+        self.defensive_depth = max(1, map_model.width * 5 // 32)
+        self.spawn_depth = max(1, map_model.width * 4 // 32)
+        self.border_x = self.get_border_x()
+        self.home_border_cells = map_model.get_column(self.border_x)
+
+    def get_border_x(self):
+        return None
 
     def is_position_on_safe_side(self, position):
         return False
@@ -151,47 +806,68 @@ class AgentColor:
 
 class RedAgentColor(AgentColor):
 
+    @override
+    def get_border_x(self):
+        return self.middle - 1
+
     @override
     def is_position_on_safe_side(self, position):
-        return position.x <= 16
+        return is_red_side(position.x, self.width)
 
     @override
     def get_defensive_treshold(self):
-        return 11, 15
+        return self.border_x - self.defensive_depth, self.border_x - 1
 
     @override
     def get_reposition_treshold(self):
-        return 15, 16
+        return self.border_x - 1, self.border_x
 
     @override
     def get_spawn_treshold(self):
-        return 0, 4
+        return 0, self.spawn_depth
 
 
 class BlueAgentColor(AgentColor):
 
+    @override
+    def get_border_x(self):
+        return self.middle
+
     @override
     def is_position_on_safe_side(self, position):
-        return position.x >= 17
+        return not is_red_side(position.x, self.width)
 
     @override
     def get_defensive_treshold(self):
-        return 18, 22
+        return self.border_x + 1, self.border_x + self.defensive_depth
 
     @override
     def get_reposition_treshold(self):
-        return 17, 18
+        return self.border_x, self.border_x + 1
 
     @override
     def get_spawn_treshold(self):
-        return 27, 32
+        return self.width - 1 - self.spawn_depth, self.width
+
 
 class GameInterpreter:
 
     def __init__(self, agent_index, parent):
         self.agent_index = agent_index
         self.parent = parent
+        self.map_model = None
+        self.knowledge = None
+        self.distances = None
+        self.topology = None
+        self.beliefs = None
+        self._safe_planner = None
+        self._food_index = None
+        self._food_route = None
+        self._danger_field = None
+        self.retreat_directions = None
+        self.last_decisions = {}
         self.game_data = None
+        self.context = None
         self.previous_game_state = None
         self.previous_game_data = None
         self.position_path = None
@@ -224,10 +900,47 @@ class GameInterpreter:
 
         self.game_state = self.initial_state
         self.allowed_goals = allowed_goals
+        self.scheduler = GoalScheduler(allowed_goals)
+        # Only FindingFoodGoal reads the food route, so the other agents never keep one up to date
+        self.collects_food = any(isinstance(goal, FindingFoodGoal) for goal in allowed_goals)
 
         # TODO: Remove me, this is temp for debug
         self.displayed_previous_path = False
 
+    @property
+    def safe_planner(self):
+        if self._safe_planner is None:
+            self._safe_planner = self.create_planner()
+
+        return self._safe_planner
+
+    @property
+    def food_index(self):
+        if self.knowledge is not None:
+            return self.knowledge.food_index
+
+        if self._food_index is None:
+            self._food_index = FoodIndex(self.map_model, self.distances)
+
+        return self._food_index
+
+    @property
+    def food_route(self):
+        if self._food_route is None:
+            self._food_route = FoodRoute(self.map_model, self.distances)
+
+        return self._food_route
+
+    @property
+    def danger_field(self):
+        if self._danger_field is None:
+            self._danger_field = DangerField(self.map_model, self.distances)
+
+        return self._danger_field
+
+    def create_planner(self):
+        return IncrementalPlanner(self.map_model, self.distances)
+
     def set_game_state(self, new_state):
         self.previous_game_state = self.game_state
         self.game_state = new_state
@@ -248,6 +961,9 @@ class GameInterpreter:
         #    self.display_path(path.positions, self.path_color)
         #    self.displayed_previous_path = True
 
+        if PROFILER is not None and path is not None:
+            PROFILER.record_path(reason, path)
+
         self.position_path = path
 
     def display_path(self, positions, color):
@@ -261,12 +977,8 @@ class GameInterpreter:
 
         return self.game_data.agent_color.is_position_on_safe_side(position)
 
-    @staticmethod
-    def is_position_valid(game_state, position):
-        if position.x >= 32 or position.y >= 32 or position.x < 0 or position.y < 0:
-            return False
-
-        return position not in game_state.get_walls().as_list()
+    def is_position_valid(self, position):
+        return self.map_model.is_valid(position)
 
     def handle_restricted_positions(self):
         self.restricted_positions = list()
@@ -285,6 +997,8 @@ class GameInterpreter:
             return
 
         self.game_state = self.initial_state
+        if self.collects_food:
+            self.food_route.plan(self.game_data.current_position, self.game_data.budget)
         self.last_safe_position = None
         self.previous_position = None
         self.previous_game_data = None
@@ -315,127 +1029,123 @@ class GameInterpreter:
             return
 
     def get_distance(self, from_position, to_position):
-        if from_position.x > 32 and to_position.x > 32 and from_position.y < 0 and to_position.y < 0:
-            return 1_000  # Out of bounds distance
+        return self.distances.get_distance(from_position, to_position)
 
-        try:
-            return self.parent.get_maze_distance(from_position.to_tuple(), to_position.to_tuple())
-        except Exception:
-            return 1_000
-
-    def get_empty_spaces(self, min_x=0, max_x=32, min_y=0, max_y=32):
-        empty_spaces = []
-        for x in range(32):
-            for y in range(32):
-                position = Position(x, y)
-                if not self.is_position_valid(self.game_data.game_state, position):
-                    continue
+    def get_distances(self, from_position, to_positions):
+        return self.distances.get_distances(from_position, to_positions)
 
-                if position.x < min_x or position.x > max_x:
-                    continue
+    def get_empty_spaces(self, min_x=0, max_x=None, min_y=0, max_y=None):
+        max_x = self.map_model.width - 1 if max_x is None else max_x
+        max_y = self.map_model.height - 1 if max_y is None else max_y
 
-                if position.y < min_y or position.y > max_y:
-                    continue
+        return [
+            position
+            for x in range(max(min_x, 0), min(max_x, self.map_model.width - 1) + 1)
+            for position in self.map_model.columns[x]
+            if min_y <= position.y <= max_y
+        ]
 
-                empty_spaces.append(position)
+    def get_closest_food(self, current_position):
+        return self.food_index.nearest(current_position)
 
-        return empty_spaces
+    def is_dead_end_trap(self, position, threats):
+        """Whether a ghost in threats can reach the exit of position's dead end before we get there and back out."""
+        depth = self.topology.get_dead_end_depth(position)
+        if depth == 0 or not threats:
+            return False
 
-    def get_closest_food(self, current_position, remaining_food):
-        mapped_positions = {
-            pos: self.get_distance(current_position, Position.from_tuple(pos))
-            for pos in remaining_food
-        }
+        pocket_exit = self.topology.get_exit(position)
+        if pocket_exit is None:
+            return False
 
-        if not mapped_positions:
-            return None
+        escape_steps = self.get_distance(self.game_data.current_position, position) + depth
+        return min(self.get_distances(pocket_exit, threats)) <= escape_steps
 
-        closest_position, closest_distance = min(
-            mapped_positions.items(),
-            key=lambda item: item[1]
-        )
+    def get_likely_replans(self):
+        """Cells the food route may be replanned from next turn, most likely first, each with the pellets left once
+        we stand there: the next step of the current path, our spawn after a death, and every other cell in reach."""
+        food = frozenset(self.food_route.food)
+        current = self.map_model.get_open_index(self.game_data.current_position)
+        cells = []
 
-        return closest_position, closest_distance
+        if self.position_path is not None and not self.position_path.is_completed():
+            cells.append(self.map_model.get_open_index(self.position_path.positions[self.position_path.current_step]))
 
-    def get_closest_safe_position(self, current_position, restricted=set()):
-        if self.last_safe_position is None:
-            return None
-
-        closest = None
-        for y in range(32):
-            position = self.last_safe_position.__set_y__(y)
+        if self.starting_position is not None:
+            cells.append(self.map_model.get_open_index(self.starting_position))
 
-            if not self.is_position_safe(position) or not self.is_position_valid(self.game_data.game_state, position):
-                continue
+        if current >= 0:
+            cells.append(current)
+            cells.extend(self.map_model.adjacency[current])
 
-            position_path = PositionPath(self.game_data, current_position, position, restricted)
-            if position_path.is_empty():
-                continue
+        replans = ((cell, food - {cell}) for cell in dict.fromkeys(cells) if cell >= 0)
+        return [(cell, remaining) for cell, remaining in replans if remaining]
 
-            if closest is None:
-                closest = position_path
-                continue
+    def get_next_food_path(self, current_position, restricted):
+        threats = self.context.threatening_ghosts
+        if threats:
+            food_targets = [
+                food
+                for food in (Position.from_tuple(food) for food in self.game_data.food_positions)
+                if not self.is_dead_end_trap(food, threats)
+            ]
+            if not food_targets:
+                return self.context.closest_safe_path
 
-            if closest.needed_steps > position_path.needed_steps:
-                closest = position_path
+            return PositionPath.to_nearest(self.game_data, current_position, food_targets, restricted)
 
-        return closest
+        closest_food = self.context.closest_food
+        if closest_food is not None:
+            self.food_route.reanchor(current_position, closest_food[1], self.game_data.budget)
 
-    # Returns an enemy in attacker territory (other)
-    def get_valid_defensive_enemy(self, game_data, distance_threshold):
-        current_position = game_data.current_position
-        enemies = game_data.enemies
+        if restricted:
+            target = self.food_route.next_target()
+            if target is None:
+                return PositionPath.from_positions(current_position, [])
 
-        valid_enemies = list()
-        for enemy in enemies:
-            enemy_position = enemy["pos"]
-            if enemy_position is None or self.is_position_safe(Position.from_tuple(enemy_position)):
-                continue
+            return PositionPath(self.game_data, current_position, target, restricted)
 
-            distance = self.get_distance(current_position, Position.from_tuple(enemy_position))
-            if distance > distance_threshold:
-                continue
+        # The next pellet on the route can be cut off from here, the field still leads to the closest reachable one
+        path = self.food_route.path_from(current_position) or self.food_index.path_from(current_position)
+        return PositionPath.from_positions(current_position, path)
 
-            valid_enemies.append(enemy)
+    def get_closest_safe_position(self, current_position, restricted=set(), costs=None):
+        if self.last_safe_position is None:
+            safe_column = self.game_data.agent_color.home_border_cells
+        else:
+            safe_column = [
+                position
+                for position in self.map_model.get_column(self.last_safe_position.x)
+                if self.is_position_safe(position)
+            ]
 
-        if len(valid_enemies) <= 0:
+        closest = self.safe_planner.plan(current_position, safe_column, restricted, self.game_data.budget, costs)
+        if closest.is_empty():
             return None
 
-        current_position = game_data.current_position
-        return min(
-            valid_enemies,
-            key=lambda item: self.get_distance(current_position, item["pos"])
-        )
-
-    # Returns an enemy in home territory (self)
-    def get_valid_offensive_enemy(self, game_data):
-        enemies = game_data.enemies
-
-        valid_enemies = list()
-        for enemy in enemies:
-            enemy_position = enemy["pos"]
+        return closest
 
-            if enemy_position is None or not self.is_position_safe(Position.from_tuple(enemy_position)):
-                continue
+    # Returns an enemy in attacker territory (other)
+    def get_valid_defensive_enemy(self, game_data, distance_threshold):
+        for enemy, distance in self.context.defensive_enemies:
+            return enemy if distance <= distance_threshold else None
 
-            valid_enemies.append(enemy)
+        return None
 
-        if len(valid_enemies) <= 0:
-            return None
+    # Returns an enemy in home territory (self)
+    def get_valid_offensive_enemy(self, game_data):
+        for enemy, _ in self.context.offensive_enemies:
+            return enemy
 
-        current_position = game_data.current_position
-        return min(
-            valid_enemies,
-            key=lambda item: self.get_distance(current_position, item["pos"])
-        )
+        return None
 
     def get_random_reposition_position(self, game_data, origin):
-        return self.get_random_treshold_position(game_data, origin, game_data.agent_color.get_reposition_treshold(), 1_000)
+        return self.get_random_treshold_position(game_data, origin, game_data.agent_color.get_reposition_treshold(), 1_000, avoid_dead_ends=True)
 
     def get_random_defensive_position(self, game_data, origin, max_distance):
         return self.get_random_treshold_position(game_data, origin, game_data.agent_color.get_defensive_treshold(), max_distance)
 
-    def get_random_treshold_position(self, game_data, origin, treshold, max_distance):
+    def get_random_treshold_position(self, game_data, origin, treshold, max_distance, avoid_dead_ends=False):
         empty_spaces = self.get_empty_spaces(min_x=treshold[0], max_x=treshold[1])
 
         for _ in range(100):
@@ -444,7 +1154,10 @@ class GameInterpreter:
             if candidate == origin:
                 continue
 
-            if not self.is_position_valid(game_data.game_state, candidate) or not self.is_position_safe(candidate):
+            if not self.is_position_valid(candidate) or not self.is_position_safe(candidate):
+                continue
+
+            if avoid_dead_ends and self.topology.get_dead_end_depth(candidate) > 0:
                 continue
 
             distance = self.get_distance(origin, candidate)
@@ -455,8 +1168,26 @@ class GameInterpreter:
 
         return None
 
+    def get_fallback_move(self, legal_directions):
+        """A move that needs no planning: the next step of the current path, otherwise the retreat direction."""
+        current_position = self.game_data.current_position
+
+        if self.position_path is not None and not self.position_path.is_completed():
+            move = Direction.from_position(current_position, self.position_path.positions[self.position_path.current_step])
+            if move is not None and move.__str__() in legal_directions:
+                self.position_path.step()
+                return move
+
+        cell = self.map_model.get_open_index(current_position)
+        if self.retreat_directions is None or cell < 0:
+            return None
+
+        move = self.retreat_directions[cell]
+        return move if move.__str__() in legal_directions else None
+
     def compute_next_move(self, game_data):
         self.game_data = game_data
+        self.context = TurnContext(self, game_data) if PROFILER is None else ProfiledTurnContext(self, game_data)
 
         legal_directions = game_data.legal_moves
         current_position = game_data.current_position
@@ -464,6 +1195,10 @@ class GameInterpreter:
         if self.starting_position is None:
             self.starting_position = current_position
 
+        self.food_index.apply(game_data.events)
+        if self.collects_food:
+            self.food_route.apply(game_data.events, current_position, game_data.budget)
+
         if self.is_position_safe(current_position) and current_position is not self.last_safe_position:
             self.last_safe_position = current_position
 
@@ -471,17 +1206,18 @@ class GameInterpreter:
         self.handle_restricted_positions()
 
         if self.capsules is None:
-            self.capsules = self.game_data.capsules
+            self.capsules = [Capsule(capsule.position) for capsule in self.game_data.capsules]
 
         for capsule in self.capsules:
             self.handle_capsule_state(capsule)
 
-        detailed_move = defaultdict()
-        for goal in self.allowed_goals:
-            compute_result = goal.compute()
-            detailed_move[goal.__class__] = compute_result
+        self.last_decisions = self.scheduler.run(self, game_data.budget)
 
-        CustomUniversalAgent.mapped_decisions[self.agent_index].append(detailed_move)
+        if game_data.budget.expired():
+            # Watchdog: out of time, take whatever move is already known instead of a fresh decision
+            self.previous_position = current_position
+            self.previous_game_data = game_data
+            return self.get_fallback_move(legal_directions) or Direction.STOP
 
         if self.position_path is not None:
             next_step = self.position_path.step()
@@ -502,10 +1238,67 @@ class GameInterpreter:
         return Direction.STOP
 
 
+class GoalScheduler:
+    """Runs only the goals that GOAL_SCHEDULE allows to act in the current game state.
+
+    The state is looked up again before every goal, so a transition made by one goal decides which of the
+    following goals run in the same turn, exactly as when every goal was computed. Once the turn budget has
+    run out the remaining goals are skipped as well.
+    """
+
+    def __init__(self, goals):
+        self.goals = goals
+        self.evaluated = 0
+        self.skipped = 0
+        self.skipped_by_goal = defaultdict(int)
+        self.out_of_budget = 0
+
+    def run(self, interpreter, budget):
+        results = {}
+        for goal in self.goals:
+            if budget.expired():
+                self.out_of_budget += 1
+                break
+
+            if goal.__class__ not in GOAL_SCHEDULE.get(interpreter.game_state, (goal.__class__,)):
+                self.skipped += 1
+                self.skipped_by_goal[goal.__class__.__name__] += 1
+                continue
+
+            self.evaluated += 1
+            if PROFILER is None:
+                results[goal.__class__] = goal.compute()
+                continue
+
+            PROFILER.enter(goal.__class__.__name__)
+            results[goal.__class__] = goal.compute()
+            PROFILER.goal_times[goal.__class__.__name__].add(PROFILER.exit())
+
+        return results
+
+    def report(self):
+        total = self.evaluated + self.skipped
+        return {
+            "evaluated": self.evaluated,
+            "skipped": self.skipped,
+            "skipped_ratio": self.skipped / total if total else 0.0,
+            "skipped_by_goal": dict(self.skipped_by_goal),
+            "out_of_budget": self.out_of_budget
+        }
+
+
 class AgentGoal:
 
     def __init__(self, parent):
         self.parent = parent
+        self._planner = None
+
+    @property
+    def planner(self):
+        if self._planner is None:
+            self._planner = self.parent.create_planner()
+
+        return self._planner
 
     def compute(self) -> str:
         return "None"
@@ -513,41 +1306,42 @@ class AgentGoal:
 
 class FindingFoodGoal(AgentGoal):
 
+    DEPOSIT_TRIGGER = 3
+    DEPOSIT_DANGER = 0.5  # Expected unseen ghosts within BeliefTracker.DANGER_RADIUS that make a single pellet worth banking
+
     @override
     def compute(self):
-        remaining_food = self.parent.game_data.food_positions
-        current_position = self.parent.game_data.current_position
-        closest_food_entry = self.parent.get_closest_food(current_position, remaining_food)
-
         valid_goals = [GameState.FINDING_FOOD, GameState.DEPOSITING_FOOD, GameState.ATTACKING]
         if self.parent.game_state not in valid_goals:
             return "Different goal active"
 
+        remaining_food = self.parent.game_data.food_positions
+        current_position = self.parent.game_data.current_position
+
         if self.parent.game_state is GameState.ATTACKING and self.parent.position_path is not None and not self.parent.position_path.is_completed():
             return "Attacking an enemy already"
 
         if len(remaining_food) == 0 and (self.parent.position_path is None or self.parent.position_path.is_completed()):
-            closest_safe = self.parent.get_closest_safe_position(current_position)
+            closest_safe = self.parent.context.closest_safe_path
             self.parent.set_position_path(closest_safe, "All food has been consumed, returning home")
             return "All food has been collected, returning home"
 
+        closest_food_entry = self.parent.context.closest_food
         is_food_square = self.parent.previous_game_data is not None and Position.to_tuple(current_position) in self.parent.previous_game_data.food_positions
         if is_food_square:
             self.parent.collected_food += 1
 
-        if self.parent.collected_food >= 3 and self.parent.game_state is not GameState.DEPOSITING_FOOD and self.parent.game_state is not GameState.ATTACKING and (closest_food_entry is not None and closest_food_entry[1] >= 2):
+        if (self.parent.collected_food >= self.DEPOSIT_TRIGGER or self.parent.collected_food >= 1 and self.parent.context.hidden_danger >= self.DEPOSIT_DANGER) and self.parent.game_state is not GameState.DEPOSITING_FOOD and self.parent.game_state is not GameState.ATTACKING and (closest_food_entry is not None and closest_food_entry[1] >= 2):
             self.parent.set_game_state(GameState.DEPOSITING_FOOD)
-            return "Collected at least 3 food, returning home to deposit"
+            return f"Collected at least {self.DEPOSIT_TRIGGER} food, returning home to deposit"
+
+        if self.parent.game_state is GameState.FINDING_FOOD and self.parent.position_path is not None and not self.parent.position_path.is_completed() and self.parent.is_dead_end_trap(self.parent.position_path.destination, self.parent.context.threatening_ghosts):
+            self.parent.set_position_path(None, "Food target became a dead end trap")
 
         if self.parent.position_path is not None and not self.parent.position_path.is_completed() or closest_food_entry is None:
             return "Already executing food collection"
 
-        food_position_path = PositionPath(self.parent.game_data, current_position, Position.from_tuple(closest_food_entry[0]), self.parent.restricted_positions)
-        if food_position_path.is_empty():
-            remaining_food.remove(closest_food_entry[0])
-            closest_food_entry = self.parent.get_closest_food(current_position, remaining_food)
-
-        self.parent.set_position_path(PositionPath(self.parent.game_data, current_position, Position.from_tuple(closest_food_entry[0]), self.parent.restricted_positions), "New food found")
+        self.parent.set_position_path(self.parent.get_next_food_path(current_position, self.parent.restricted_positions), "New food found")
         return "Executing new food collection"
 
 
@@ -555,9 +1349,7 @@ class DepositingFoodGoal(AgentGoal):
 
     @override
     def compute(self):
-        current_position = self.parent.game_data.current_position
-
-        if self.parent.collected_food > 0 and self.parent.is_position_safe(current_position):
+        if self.parent.collected_food > 0 and self.parent.context.is_current_position_safe:
             self.parent.collected_food = 0
 
             if self.parent.game_state is GameState.DEPOSITING_FOOD:
@@ -566,11 +1358,11 @@ class DepositingFoodGoal(AgentGoal):
         if self.parent.game_state is not GameState.DEPOSITING_FOOD:
             return "Different goal active"
 
-        if self.parent.is_position_safe(current_position) or self.parent.collected_food <= 0:
+        if self.parent.context.is_current_position_safe or self.parent.collected_food <= 0:
             return "Already in a safe position or no food"
 
         if self.parent.position_path is None or not self.parent.position_path.is_completed():
-            closest_safe = self.parent.get_closest_safe_position(current_position)
+            closest_safe = self.parent.context.closest_safe_path
             self.parent.set_position_path(closest_safe, "Depositing food")
 
             return "Returning home to deposit food"
@@ -584,14 +1376,16 @@ class DepositingFoodGoal(AgentGoal):
 
 class OffensiveFleeingGoal(AgentGoal):
 
+    FLEE_RADIUS = 3
+
     @override
     def compute(self):
-        valid_enemy = self.parent.get_valid_defensive_enemy(self.parent.game_data, 3)
-        current_position = self.parent.game_data.current_position
-
         if self.parent.game_state is GameState.ATTACKING:
             return "We're attacking, ignore fleeing"
 
+        valid_enemy = self.parent.get_valid_defensive_enemy(self.parent.game_data, self.FLEE_RADIUS)
+        current_position = self.parent.game_data.current_position
+
         if self.parent.game_state is GameState.OFFENSIVE_FLEEING:
             if valid_enemy is None or valid_enemy["scaredTimer"] > 3:
                 if self.parent.previous_game_state is GameState.ATTACKING:
@@ -609,14 +1403,14 @@ class OffensiveFleeingGoal(AgentGoal):
             restricted = [self.parent.previous_position]
             random_position = self.parent.get_random_reposition_position(self.parent.game_data, current_position)
 
-            self.parent.set_position_path(PositionPath(self.parent.game_data, current_position, random_position, restricted), "Being sm0rt and not falling for the good old switcheroo", show=True)
+            self.parent.set_position_path(PositionPath(self.parent.game_data, current_position, random_position, restricted, self.parent.context.danger_costs), "Being sm0rt and not falling for the good old switcheroo", show=True)
             return "Being sm0rt and not falling for the good old switcheroo"
 
         if self.parent.game_state is GameState.OFFENSIVE_FLEEING:
             return "Skipping fleeing, as we're already fleeing"
 
         restricted = [Position.from_tuple(valid_enemy["pos"])]
-        closest_safe = self.parent.get_closest_safe_position(current_position, restricted)
+        closest_safe = self.parent.get_closest_safe_position(current_position, restricted, self.parent.context.danger_costs)
 
         self.parent.set_position_path(closest_safe, "Enemy found, fleeing (Offensive)", show=True)
         self.parent.set_game_state(GameState.OFFENSIVE_FLEEING)
@@ -627,7 +1421,6 @@ class DefensiveFleeingGoal(AgentGoal):
 
     @override
     def compute(self):
-        current_position = self.parent.game_data.current_position
         if self.parent.game_state is GameState.DEFENSIVE_FLEEING and self.parent.position_path is None:
             self.parent.set_game_state(self.parent.previous_game_state)
             return "Already fleeing or resetting to previous state due to completed goal"
@@ -636,7 +1429,7 @@ class DefensiveFleeingGoal(AgentGoal):
         if valid_enemy is None or valid_enemy["isPacman"]:
             return "No valid enemy or pacman"
 
-        closest_safe = self.parent.get_closest_safe_position(current_position)
+        closest_safe = self.parent.context.closest_safe_path
         self.parent.set_position_path(closest_safe, "Enemy found, fleeing (Defensive)")
 
         self.parent.set_game_state(GameState.DEFENSIVE_FLEEING)
@@ -659,17 +1452,17 @@ class DefendingGoal(AgentGoal):
             return "Moving to initial defending position"
 
         # If we're in enemy territory, move to our side
-        if not self.parent.is_position_safe(current_position):
+        if not self.parent.context.is_current_position_safe:
             self.parent.set_position_path(PositionPath(self.parent.game_data, current_position, self.parent.last_safe_position), "Moving to defense")
 
         nearby_enemy = self.parent.get_valid_offensive_enemy(self.parent.game_data)
         if nearby_enemy is not None and (self.parent.position_path is None or not self.parent.position_path.is_completed()):
             if not self.parent.game_data.is_scared:
-                self.parent.set_position_path(PositionPath(self.parent.game_data, current_position, Position.from_tuple(nearby_enemy["pos"])), "Chasing enemy in home territory")
+                self.parent.set_position_path(self.planner.plan(current_position, [Position.from_tuple(nearby_enemy["pos"])], budget=self.parent.game_data.budget), "Chasing enemy in home territory")
                 return "Chasing enemy in home territory"
 
             restricted = [Position.from_tuple(nearby_enemy["pos"])]
-            closest_safe = self.parent.get_closest_safe_position(current_position, restricted)
+            closest_safe = self.parent.get_closest_safe_position(current_position, restricted, self.parent.context.danger_costs)
 
             self.parent.set_position_path(closest_safe, "Fleeing from enemy")
             return "Fleeing from the enemy in home territory"
@@ -679,9 +1472,15 @@ class DefendingGoal(AgentGoal):
             updated_valid_enemy = self.parent.get_valid_offensive_enemy(self.parent.game_data)
 
             if updated_valid_enemy is not None and not self.parent.game_data.is_scared:
-                self.parent.set_position_path(PositionPath(self.parent.game_data, current_position, Position.from_tuple(updated_valid_enemy["pos"])), "Updating chase position in home territory")
+                self.parent.set_position_path(self.planner.plan(current_position, [Position.from_tuple(updated_valid_enemy["pos"])], budget=self.parent.game_data.budget), "Updating chase position in home territory")
                 return "Updating chase position"
 
+        # Head for where an unseen invader most likely is, re-aimed every turn as the belief moves
+        likely_invader = self.parent.context.likely_invader
+        if likely_invader is not None and not self.parent.game_data.is_scared:
+            self.parent.set_position_path(self.planner.plan(current_position, [likely_invader], budget=self.parent.game_data.budget), "Intercepting tracked enemy")
+            return "Intercepting an unseen enemy in home territory"
+
         if self.parent.position_path is not None and not self.parent.position_path.is_completed():
             return "Already pursuing an active goal"
 
@@ -695,14 +1494,16 @@ class DefendingGoal(AgentGoal):
 
 class AttackingGoal(AgentGoal):
 
+    CHASE_RADIUS = 4
+
     @override
     def compute(self):
-        current_position = self.parent.game_data.current_position
-        valid_enemy = self.parent.get_valid_defensive_enemy(self.parent.game_data, 4)
-
         if self.parent.game_state is not GameState.ATTACKING:
             return "Not attacking"
 
+        current_position = self.parent.game_data.current_position
+        valid_enemy = self.parent.get_valid_defensive_enemy(self.parent.game_data, self.CHASE_RADIUS)
+
         if valid_enemy is None:
             return "No valid enemy found"
 
@@ -711,7 +1512,7 @@ class AttackingGoal(AgentGoal):
             return "Found enemy that was already eaten, run"
 
         target_pos = Position.from_tuple(valid_enemy["pos"])
-        self.parent.set_position_path(PositionPath(self.parent.game_data, current_position, target_pos), "Attacking visible enemy")
+        self.parent.set_position_path(self.planner.plan(current_position, [target_pos], budget=self.parent.game_data.budget), "Attacking visible enemy")
 
         return "Attacking visible enemy"
 
@@ -731,35 +1532,47 @@ class CapsuleFindGoal(AgentGoal):
         if self.parent.game_state is GameState.FINDING_CAPSULE:
             return "Already finding capsule or eaten"
 
-        for capsule in self.parent.capsules:
-            if capsule.consumed:
-                continue
-
-            capsule_position = capsule.position
+        closest_capsule = self.parent.context.closest_capsule
+        if closest_capsule is not None and closest_capsule[1] <= 3:
+            capsule_position = closest_capsule[0].position
             current_position = self.parent.game_data.current_position
-            distance = self.parent.get_distance(capsule_position, current_position)
-
-            if distance <= 3:
-                # print(self.parent.agent_index, " Setting to find capsule")
-                # print("pojedu")
-                self.parent.set_game_state(GameState.FINDING_CAPSULE)
-                self.parent.set_position_path(PositionPath(self.parent.game_data, current_position, capsule_position), "Moving to the capsule position")
-                return "Finding Capsule"
+            # print(self.parent.agent_index, " Setting to find capsule")
+            # print("pojedu")
+            self.parent.set_game_state(GameState.FINDING_CAPSULE)
+            self.parent.set_position_path(PositionPath(self.parent.game_data, current_position, capsule_position), "Moving to the capsule position")
+            return "Finding Capsule"
 
         return "Capsule is not close enough, ignoring"
 
 class Position:
+    """Interned cell coordinates: Position(x, y) always returns the same instance, so equality is identity.
+
+    Instances are shared and must never be mutated; every helper returns another interned Position.
+    """
+
+    __slots__ = ("x", "y", "hash")
 
     @staticmethod
     def from_tuple(origin):
-        return Position(origin[0], origin[1])
+        position = INTERNED_POSITIONS.get(origin)
+        if position is None:
+            position = Position(origin[0], origin[1])
 
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+        return position
+
+    def __new__(cls, x, y):
+        position = INTERNED_POSITIONS.get((x, y))
+        if position is None:
+            position = object.__new__(cls)
+            position.x = x
+            position.y = y
+            position.hash = hash((x, y))
+            INTERNED_POSITIONS[(x, y)] = position
+
+        return position
 
     def clone(self):
-        return Position(self.x, self.y)
+        return self
 
     def distance(self, other):
         return abs(self.x - other.x) + abs(self.y - other.y)
@@ -779,27 +1592,1039 @@ class Position:
     def __add__(self, x, y):
         return Position(self.x + x, self.y + y)
 
-    def __eq__(self, other):
-        return isinstance(other, Position) and self.x == other.x and self.y == other.y
+    def __reduce__(self):
+        return Position, (self.x, self.y)
 
     def __repr__(self):
         return f"Position(x={self.x}, y={self.y})"
 
     def __hash__(self):
-        return hash((self.x, self.y))
+        return self.hash
+
+
+# One Position per cell ever seen, shared across games; bounded by the largest layout played
+INTERNED_POSITIONS = {}
+
+
+class MapModel:
+    """Immutable view of the layout walls, built once per game in register_initial_state."""
+
+    def __init__(self, walls):
+        self.width = walls.width
+        self.height = walls.height
+        self.walls = bytearray(self.width * self.height)
+        self.open_cells = []
+        self.open_x = []
+        self.open_y = []
+        self.open_index = [-1] * len(self.walls)
+        self.columns = [[] for _ in range(self.width)]
+
+        for x in range(self.width):
+            for y in range(self.height):
+                if walls[x][y]:
+                    self.walls[self.cell_id(x, y)] = 1
+                else:
+                    self.open_index[self.cell_id(x, y)] = len(self.open_cells)
+                    self.open_cells.append(Position(x, y))
+                    self.columns[x].append(self.open_cells[-1])
+                    self.open_x.append(x)
+                    self.open_y.append(y)
+
+        # Neighbor order matches the original A* expansion order (east, west, north, south)
+        self.neighbors = [()] * len(self.walls)
+        for position in self.open_cells:
+            self.neighbors[self.cell_id(position.x, position.y)] = tuple(
+                Position(position.x + dx, position.y + dy)
+                for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                if self.is_open(position.x + dx, position.y + dy)
+            )
+
+        # Same neighbor tables expressed as open cell indices, used by the distance table
+        self.adjacency = [
+            tuple(self.open_index[self.cell_id(neighbor.x, neighbor.y)] for neighbor in self.get_neighbors(position))
+            for position in self.open_cells
+        ]
+
+    def cell_id(self, x, y):
+        return x * self.height + y
+
+    def is_open(self, x, y):
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return False
+
+        return not self.walls[x * self.height + y]
+
+    def is_valid(self, position):
+        return self.is_open(position.x, position.y)
+
+    def get_neighbors(self, position):
+        return self.neighbors[position.x * self.height + position.y]
+
+    def get_column(self, x):
+        if x < 0 or x >= self.width:
+            return []
+
+        return self.columns[x]
+
+    def get_open_index(self, position):
+        x = position.x
+        y = position.y
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return -1
+
+        return self.open_index[x * self.height + y]
+
+
+class MapTopology:
+    """Dead ends and chokepoints of the layout, computed once per game and stored per open cell.
+
+    Dead ends are found by repeatedly peeling cells with a single open neighbor; what remains is the looped core.
+    A peeled cell's depth is its distance to the core cell its pocket hangs off, which is also the pocket's exit.
+    Chokepoints are the articulation points of the maze graph.
+    """
+
+    NO_EXIT = -1
+
+    def __init__(self, map_model):
+        self.map_model = map_model
+        self.dead_end_depth = array('H', [0]) * len(map_model.open_cells)
+        self.exits = array('i', range(len(map_model.open_cells)))
+        self.articulation = bytearray(len(map_model.open_cells))
+
+        self._find_dead_ends(map_model.adjacency)
+        self._find_articulation_points(map_model.adjacency)
+
+    def _find_dead_ends(self, adjacency):
+        degrees = [len(neighbors) for neighbors in adjacency]
+        peeled = bytearray(len(adjacency))
+        queue = deque(cell for cell, degree in enumerate(degrees) if degree <= 1)
+
+        while queue:
+            cell = queue.popleft()
+            peeled[cell] = 1
+            for neighbor in adjacency[cell]:
+                if not peeled[neighbor]:
+                    degrees[neighbor] -= 1
+                    if degrees[neighbor] == 1:
+                        queue.append(neighbor)
+
+        # Without any loop the whole maze is one tree and nothing has a way out
+        frontier = [cell for cell in range(len(adjacency)) if not peeled[cell]]
+        if not frontier:
+            for cell in range(len(adjacency)):
+                self.exits[cell] = MapTopology.NO_EXIT
+            return
+
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for cell in frontier:
+                for neighbor in adjacency[cell]:
+                    if peeled[neighbor] and self.dead_end_depth[neighbor] == 0:
+                        self.dead_end_depth[neighbor] = depth
+                        self.exits[neighbor] = self.exits[cell]
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+    def _find_articulation_points(self, adjacency):
+        """Iterative Tarjan low-link search, so large layouts don't hit the recursion limit."""
+        discovery = [-1] * len(adjacency)
+        low = [0] * len(adjacency)
+        counter = 0
+
+        for root in range(len(adjacency)):
+            if discovery[root] >= 0:
+                continue
+
+            discovery[root] = low[root] = counter
+            counter += 1
+            root_children = 0
+            stack = [(root, -1, iter(adjacency[root]))]
+
+            while stack:
+                cell, parent, neighbors = stack[-1]
+                for neighbor in neighbors:
+                    if discovery[neighbor] < 0:
+                        discovery[neighbor] = low[neighbor] = counter
+                        counter += 1
+                        stack.append((neighbor, cell, iter(adjacency[neighbor])))
+                        break
+
+                    if neighbor != parent:
+                        low[cell] = min(low[cell], discovery[neighbor])
+                else:
+                    stack.pop()
+                    if parent < 0:
+                        continue
+
+                    low[parent] = min(low[parent], low[cell])
+                    if parent == root:
+                        root_children += 1
+                    elif low[cell] >= discovery[parent]:
+                        self.articulation[parent] = 1
+
+            if root_children > 1:
+                self.articulation[root] = 1
+
+    def get_dead_end_depth(self, position):
+        cell = self.map_model.get_open_index(position)
+        return self.dead_end_depth[cell] if cell >= 0 else 0
+
+    def get_exit(self, position):
+        """The core cell a dead end opens onto (the cell itself outside dead ends), None without one."""
+        cell = self.map_model.get_open_index(position)
+        if cell < 0 or self.exits[cell] == MapTopology.NO_EXIT:
+            return None
+
+        return self.map_model.open_cells[self.exits[cell]]
+
+    def is_chokepoint(self, position):
+        cell = self.map_model.get_open_index(position)
+        return cell >= 0 and self.articulation[cell] == 1
+
+
+class DistanceTable:
+    """All-pairs maze distances between open cells, filled with one BFS per cell."""
+
+    UNREACHABLE = 0xFFFF
+
+    def __init__(self, map_model, distances=None):
+        self.map_model = map_model
+        self.size = len(map_model.open_cells)
+        self.distances = distances if distances is not None else self._build(map_model.adjacency)
+
+    @staticmethod
+    def _build(adjacency):
+        size = len(adjacency)
+        unreachable = DistanceTable.UNREACHABLE
+        distances = array('H', [unreachable]) * (size * size)
+
+        for source in range(size):
+            row = [unreachable] * size
+            row[source] = 0
+            frontier = [source]
+            depth = 0
+
+            while frontier:
+                depth += 1
+                next_frontier = []
+                for cell in frontier:
+                    for neighbor in adjacency[cell]:
+                        if row[neighbor] == unreachable:
+                            row[neighbor] = depth
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+
+            distances[source * size:(source + 1) * size] = array('H', row)
+
+        return distances
+
+    def get_distance(self, from_position, to_position):
+        from_index = self.map_model.get_open_index(from_position)
+        to_index = self.map_model.get_open_index(to_position)
+
+        if from_index < 0 or to_index < 0:
+            return 1_000  # Out of bounds distance
+
+        distance = self.distances[from_index * self.size + to_index]
+        return 1_000 if distance == DistanceTable.UNREACHABLE else distance
+
+    def get_distances(self, from_position, to_positions):
+        from_index = self.map_model.get_open_index(from_position)
+        if from_index < 0:
+            return [1_000] * len(to_positions)
+
+        offset = from_index * self.size
+        distances = self.distances
+        result = []
+
+        for position in to_positions:
+            to_index = self.map_model.get_open_index(position)
+            distance = distances[offset + to_index] if to_index >= 0 else DistanceTable.UNREACHABLE
+            result.append(1_000 if distance == DistanceTable.UNREACHABLE else distance)
+
+        return result
+
+
+class FoodIndex:
+    """Remaining pellets and a nearest-food distance field over the map, kept up to date from food change events.
+
+    Every open cell stores the distance to its closest pellet and which pellet that is. Eaten pellets only
+    re-seed the cells they owned, and dropped pellets only flood the cells they are now closest to.
+    """
+
+    def __init__(self, map_model, distances):
+        self.map_model = map_model
+        self.distances = distances
+        self.food = set()
+        self.field = [DistanceTable.UNREACHABLE] * len(map_model.open_cells)
+        self.owner = [-1] * len(map_model.open_cells)
+
+    def apply(self, events):
+        open_index = self.map_model.open_index
+        height = self.map_model.height
+        removed = set()
+        added = set()
+
+        for kind, position in events:
+            if kind is ChangeEvent.FOOD_REMOVED:
+                removed.add(open_index[position[0] * height + position[1]])
+            elif kind is ChangeEvent.FOOD_ADDED:
+                added.add(open_index[position[0] * height + position[1]])
+
+        # A teammate sharing this index may already have applied the same change
+        removed &= self.food
+        added -= self.food
+
+        if removed:
+            self.food -= removed
+            self._remove(removed)
+
+        if added:
+            self.food |= added
+            self._add(added)
+
+        return bool(removed or added)
+
+    def nearest(self, position):
+        cell = self.map_model.get_open_index(position)
+        if cell < 0 or self.owner[cell] < 0:
+            return None
+
+        return self.map_model.open_cells[self.owner[cell]].to_tuple(), self.field[cell]
+
+    def path_from(self, position):
+        """Steps from position to its closest pellet, following the field downhill."""
+        cell = self.map_model.get_open_index(position)
+        if cell < 0 or self.owner[cell] < 0:
+            return []
+
+        adjacency = self.map_model.adjacency
+        field = self.field
+        result = []
+
+        while field[cell] > 0:
+            cell = min(adjacency[cell], key=field.__getitem__)
+            result.append(self.map_model.open_cells[cell])
+
+        return result
+
+    def _add(self, cells):
+        adjacency = self.map_model.adjacency
+        field = self.field
+        owner = self.owner
+
+        for cell in cells:
+            field[cell] = 0
+            owner[cell] = cell
+
+        frontier = list(cells)
+        while frontier:
+            next_frontier = []
+            for cell in frontier:
+                distance = field[cell] + 1
+                for neighbor in adjacency[cell]:
+                    if distance < field[neighbor]:
+                        field[neighbor] = distance
+                        owner[neighbor] = owner[cell]
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+    def _remove(self, cells):
+        adjacency = self.map_model.adjacency
+        field = self.field
+        owner = self.owner
+
+        # Cells owned by a pellet form a connected region around it, so the affected area is found by flooding
+        affected = set(cells)
+        frontier = list(cells)
+        while frontier:
+            next_frontier = []
+            for cell in frontier:
+                for neighbor in adjacency[cell]:
+                    if neighbor not in affected and owner[neighbor] in cells:
+                        affected.add(neighbor)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        for cell in affected:
+            field[cell] = DistanceTable.UNREACHABLE
+            owner[cell] = -1
+
+        queue = []
+        for cell in affected:
+            for neighbor in adjacency[cell]:
+                if owner[neighbor] >= 0:
+                    queue.append((field[neighbor] + 1, cell, owner[neighbor]))
+
+        heapq.heapify(queue)
+        while queue:
+            distance, cell, source = heapq.heappop(queue)
+            if distance >= field[cell]:
+                continue
+
+            field[cell] = distance
+            owner[cell] = source
+            for neighbor in adjacency[cell]:
+                if distance + 1 < field[neighbor]:
+                    heapq.heappush(queue, (distance + 1, neighbor, source))
+
+
+class FoodRoute:
+    """Order in which to collect the remaining pellets, planned once and repaired as the food changes.
+
+    Pellets within LINK_DISTANCE maze steps of each other form a cluster. Clusters are visited in nearest-neighbor
+    order and each one is swept in nearest-neighbor order from where the previous one ended. Eaten pellets drop
+    out lazily, dropped pellets are inserted where they lengthen the route least, and a death replans from spawn.
+    The route is also replanned when its next pellet is REPLAN_SLACK steps further than the closest one, which
+    happens after returning home to deposit.
+    """
+
+    LINK_DISTANCE = 2
+    REPLAN_SLACK = 1
+    UNTANGLE_PASSES = 3
+
+    def __init__(self, map_model, distances):
+        self.map_model = map_model
+        self.distances = distances
+        self.food = set()
+        self.route = []
+        self.head = 0
+        self.warmer = None
+
+    def apply(self, events, position, budget=None):
+        open_index = self.map_model.open_index
+        height = self.map_model.height
+        added = []
+
+        for kind, food in events:
+            if kind is ChangeEvent.FOOD_REMOVED:
+                self.food.discard(open_index[food[0] * height + food[1]])
+            elif kind is ChangeEvent.FOOD_ADDED:
+                added.append(open_index[food[0] * height + food[1]])
+
+        if not added:
+            return
+
+        if not self.food:
+            self.food.update(added)
+            self.plan(position, budget)
+            return
+
+        for cell in added:
+            self.food.add(cell)
+            self._insert(cell)
+
+    def plan(self, position, budget=None):
+        # Out of time the old route still visits every remaining pellet, only less directly
+        if budget is not None and budget.expired() and self.route:
+            return
+
+        start = self.map_model.get_open_index(position)
+        route = self.warmer.take(self.food, start) if self.warmer is not None else None
+        if PROFILER is not None and self.warmer is not None:
+            PROFILER.count("route_warmer.hit" if route is not None else "route_warmer.miss")
+
+        self.route = route if route is not None else self.build(self.food, start, budget.deadline if budget is not None else None)
+        self.head = 0
+
+    def build(self, food, start, deadline=None):
+        """A fresh route through the given pellet cells, starting from cell start (-1 when off the map).
+
+        Untangling stops once the deadline passes, leaving the nearest-neighbor order as it is by then.
+        """
+        size = self.distances.size
+        distances = self.distances.distances
+        current = start
+        clusters = self._cluster(sorted(food))
+        route = []
+
+        while clusters:
+            if current >= 0:
+                offset = current * size
+                closest = min(range(len(clusters)), key=lambda index: min(distances[offset + cell] for cell in clusters[index]))
+            else:
+                closest = 0
+
+            cluster = clusters.pop(closest)
+            route.extend(self._sweep(cluster, current))
+            current = route[-1]
+
+        return self._untangle(route, start, deadline)
+
+    def next_target(self):
+        while self.head < len(self.route) and self.route[self.head] not in self.food:
+            self.head += 1
+
+        if self.head == len(self.route):
+            return None
+
+        return self.map_model.open_cells[self.route[self.head]]
+
+    def reanchor(self, position, closest_distance, budget=None):
+        target = self.next_target()
+        cell = self.map_model.get_open_index(position)
+        if target is None or cell < 0:
+            return
+
+        if self.distances.distances[self.route[self.head] * self.distances.size + cell] > closest_distance + FoodRoute.REPLAN_SLACK:
+            self.plan(position, budget)
+
+    def path_from(self, position):
+        """Steps from position to the next pellet on the route, following its distance table row downhill.
+
+        Empty when that pellet can't be reached from position.
+        """
+        target = self.next_target()
+        cell = self.map_model.get_open_index(position)
+        if target is None or cell < 0:
+            return []
+
+        adjacency = self.map_model.adjacency
+        distances = self.distances.distances
+        offset = self.route[self.head] * self.distances.size
+        if distances[offset + cell] == DistanceTable.UNREACHABLE:
+            return []
+
+        result = []
+        while distances[offset + cell] > 0:
+            cell = min(adjacency[cell], key=lambda neighbor: distances[offset + neighbor])
+            result.append(self.map_model.open_cells[cell])
+
+        return result
+
+    def _cluster(self, cells):
+        size = self.distances.size
+        distances = self.distances.distances
+        unassigned = set(cells)
+        clusters = []
+
+        for seed in cells:
+            if seed not in unassigned:
+                continue
+
+            unassigned.discard(seed)
+            cluster = [seed]
+            frontier = [seed]
+            while frontier:
+                cell = frontier.pop()
+                offset = cell * size
+                linked = [other for other in unassigned if distances[offset + other] <= FoodRoute.LINK_DISTANCE]
+                unassigned.difference_update(linked)
+                cluster.extend(linked)
+                frontier.extend(linked)
+
+            clusters.append(cluster)
+
+        return clusters
+
+    def _sweep(self, cluster, current):
+        size = self.distances.size
+        distances = self.distances.distances
+        remaining = set(cluster)
+        ordered = []
+
+        while remaining:
+            if current >= 0:
+                offset = current * size
+                current = min(remaining, key=lambda cell: (distances[offset + cell], cell))
+            else:
+                current = min(remaining)
+
+            remaining.discard(current)
+            ordered.append(current)
+
+        return ordered
+
+    def _untangle(self, route, start, deadline=None):
+        """2-opt passes over the open route: reverses any stretch that makes the whole route shorter."""
+        size = self.distances.size
+        distances = self.distances.distances
+
+        for _ in range(FoodRoute.UNTANGLE_PASSES):
+            improved = False
+            for i in range(len(route) - 1):
+                if deadline is not None and time.perf_counter() > deadline:
+                    return route
+
+                before = route[i - 1] if i > 0 else start
+                first = route[i]
+                for j in range(i + 1, len(route)):
+                    last = route[j]
+                    after = route[j + 1] if j + 1 < len(route) else -1
+
+                    current_cost = (distances[before * size + first] if before >= 0 else 0) + (distances[last * size + after] if after >= 0 else 0)
+                    reversed_cost = (distances[before * size + last] if before >= 0 else 0) + (distances[first * size + after] if after >= 0 else 0)
+                    if reversed_cost < current_cost:
+                        route[i:j + 1] = route[i:j + 1][::-1]
+                        first = route[i]
+                        improved = True
+
+            if not improved:
+                break
+
+        return route
+
+    def _insert(self, cell):
+        size = self.distances.size
+        distances = self.distances.distances
+        pending = [food for food in self.route[self.head:] if food in self.food and food != cell]
+
+        # Appending costs the step from the last pellet; between two pellets it costs the detour
+        best_index = len(pending)
+        best_cost = distances[pending[-1] * size + cell] if pending else 0
+        for index in range(1, len(pending)):
+            previous = pending[index - 1]
+            following = pending[index]
+            cost = distances[previous * size + cell] + distances[cell * size + following] - distances[previous * size + following]
+            if cost < best_cost:
+                best_index = index
+                best_cost = cost
+
+        pending.insert(best_index, cell)
+        self.route = pending
+        self.head = 0
+
+
+class RouteWarmer:
+    """Forked helper process that plans food routes while the other agents move, enabled with warm_routes=1.
+
+    After each turn the agent sends the cells it may replan from next turn, each with the pellets expected to be
+    left by then. The helper plans them one at a time, dropping the rest once a newer request arrives, and
+    FoodRoute.plan uses an answer only when start and pellets match exactly, planning synchronously otherwise.
+    A slow or missing helper therefore costs no more than the usual plan.
+    """
+
+    NICENESS = 10  # Below the game process, so on a single core the helper only uses otherwise idle time
+
+    def __init__(self, process, connection):
+        self.process = process
+        self.connection = connection
+        self.plans = {}
+
+    @classmethod
+    def start(cls, route):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return None
+
+        # Forked, so the helper shares the distance table instead of receiving a pickled copy
+        context = multiprocessing.get_context("fork")
+        connection, child_connection = context.Pipe()
+        process = context.Process(target=cls.serve, args=(route, child_connection), daemon=True)
+
+        try:
+            process.start()
+        except OSError:
+            return None
+
+        child_connection.close()
+        return cls(process, connection)
+
+    @staticmethod
+    def serve(route, connection):
+        try:
+            os.nice(RouteWarmer.NICENESS)
+        except (AttributeError, OSError):
+            pass
+
+        request = []
+        while True:
+            try:
+                if not request or connection.poll():
+                    request = connection.recv()
+                    while connection.poll():
+                        request = connection.recv()
+
+                if request is None:
+                    return
+
+                # One plan at a time, so a newer request replaces whatever is left of this one
+                start, food = request.pop(0)
+                connection.send(((start, food), route.build(food, start)))
+            except (EOFError, OSError):
+                return
+
+    def receive(self):
+        # Drained on every call, so unread answers never fill the pipe and block the helper
+        if self.connection is None:
+            return
+
+        try:
+            while self.connection.poll():
+                key, plan = self.connection.recv()
+                self.plans[key] = plan
+        except (EOFError, OSError):
+            self.close()
+
+    def submit(self, replans):
+        self.receive()
+        if not replans or self.connection is None:
+            return
+
+        # Earlier answers were for cells we have moved on from
+        self.plans = {}
+        try:
+            self.connection.send(replans)
+        except OSError:
+            self.close()
+
+    def take(self, food, start):
+        self.receive()
+        if not self.plans:
+            return None
+
+        return self.plans.pop((start, frozenset(food)), None)
+
+    def close(self):
+        if self.connection is None:
+            return
+
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+
+        self.connection.close()
+        self.connection = None
+        self.process.join(timeout=0.1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class DangerField:
+    """Per-cell extra step cost around threatening enemies, rebuilt every turn from their distance table rows.
+
+    A cell at maze distance d < RADIUS from an enemy costs weight * (RADIUS - d) ** 2 extra to enter, summed over
+    enemies. Uses NumPy on the whole table when it is installed, and a plain loop over the rows otherwise.
+    """
+
+    RADIUS = 5
+    SCARED_MARGIN = 4  # Enemies scared for this many more turns are harmless, matching the goals' "> 3" checks
+
+    def __init__(self, map_model, distances):
+        self.map_model = map_model
+        self.distances = distances
+        self.size = distances.size
+        self.matrix = np.frombuffer(distances.distances, dtype=np.uint16).reshape(self.size, self.size) if np is not None else None
+
+    @staticmethod
+    def get_weight(scared_timer):
+        return max(0, DangerField.SCARED_MARGIN - scared_timer) / DangerField.SCARED_MARGIN
+
+    def compute(self, threats):
+        """Costs for a list of (position, weight) threats, or None when nothing is threatening."""
+        cells = []
+        weights = []
+        for position, weight in threats:
+            cell = self.map_model.get_open_index(position)
+            if cell >= 0 and weight > 0:
+                cells.append(cell)
+                weights.append(weight)
+
+        if not cells:
+            return None
+
+        if self.matrix is not None:
+            proximity = np.clip(DangerField.RADIUS - self.matrix[cells].astype(np.int32), 0, None)
+            danger = (np.array(weights)[:, None] * proximity * proximity).sum(axis=0)
+            return np.rint(danger).astype(np.int32).tolist()
+
+        danger = [0.0] * self.size
+        distances = self.distances.distances
+        for cell, weight in zip(cells, weights):
+            offset = cell * self.size
+            for other in range(self.size):
+                distance = distances[offset + other]
+                if distance < DangerField.RADIUS:
+                    danger[other] += weight * (DangerField.RADIUS - distance) ** 2
+
+        return [round(value) for value in danger]
+
+
+class BeliefTracker:
+    """Where each enemy probably is, as one NumPy probability vector over the open cells per enemy.
+
+    Both agents of a team update the same tracker. For every turn an unseen enemy took since the last update its
+    belief spreads to neighboring cells (it moves or stops uniformly at random), cells our team can see are ruled
+    out and the rest are weighted by the observer's noisy distance reading, which the contest draws uniformly within
+    SONAR_NOISE of the true Manhattan distance. Needs NumPy; without it there is no tracker.
+    """
+
+    SONAR_NOISE = 6
+    SIGHT_RANGE = 5
+    CONFIDENT_MASS = 0.5
+    DANGER_RADIUS = 8
+
+    def __init__(self, map_model, distances, spawns, agent_color):
+        size = len(map_model.open_cells)
+        self.map_model = map_model
+        self.size = size
+        self.open_x = np.array(map_model.open_x)
+        self.open_y = np.array(map_model.open_y)
+        self.matrix = np.frombuffer(distances.distances, dtype=np.uint16).reshape(size, size)
+        self.home_side = np.array([agent_color.is_position_on_safe_side(position) for position in map_model.open_cells])
+
+        # Every cell followed by its neighbors, padded with a slot that always holds zero, so a spread is one gather
+        self.moves = np.full((size, 5), size, dtype=np.intp)
+        for cell, neighbors in enumerate(map_model.adjacency):
+            self.moves[cell, :len(neighbors) + 1] = (cell,) + neighbors
+        self.move_share = 1.0 / (1 + np.array([len(neighbors) for neighbors in map_model.adjacency]))
+
+        self.spawns = {index: map_model.get_open_index(Position.from_tuple(spawn)) for index, spawn in spawns.items()}
+        self.beliefs = {index: self._certain(cell) for index, cell in self.spawns.items()}
+        self.last_observer = None
+
+    def _certain(self, cell):
+        belief = np.zeros(self.size)
+        belief[cell] = 1.0
+        return belief
+
+    def moved_since_last_update(self, observer, num_agents):
+        """Enemies that took a turn since the previous update; the tracker is shared, so that may be half a round."""
+        previous = -1 if self.last_observer is None else self.last_observer
+        plies = (observer - previous) % num_agents or num_agents
+
+        return {(previous + ply) % num_agents for ply in range(1, plies)}
+
+    def update(self, game_state, team_positions, observer):
+        moved = self.moved_since_last_update(observer, game_state.get_num_agents())
+        self.last_observer = observer
+
+        readings = game_state.get_agent_distances()
+        observer_position = team_positions[0]
+        observer_distances = np.abs(self.open_x - observer_position[0]) + np.abs(self.open_y - observer_position[1])
+
+        visible = np.zeros(self.size, dtype=bool)
+        for x, y in team_positions:
+            visible |= np.abs(self.open_x - x) + np.abs(self.open_y - y) <= BeliefTracker.SIGHT_RANGE
+
+        for index in self.beliefs:
+            position = game_state.get_agent_state(index).get_position()
+            if position is not None:
+                self.beliefs[index] = self._certain(self.map_model.get_open_index(Position.from_tuple(position)))
+                continue
+
+            consistent = ~visible
+            if readings is not None and readings[index] is not None:
+                consistent &= np.abs(observer_distances - readings[index]) <= BeliefTracker.SONAR_NOISE
+
+            if index in moved:
+                spread = np.append(self.beliefs[index] * self.move_share, 0.0)[self.moves].sum(axis=1)
+            else:
+                spread = self.beliefs[index].copy()
+            spread *= consistent
+            total = spread.sum()
+
+            # No mass left means the model lost it, usually because we ate the enemy and it respawned
+            if total <= 0:
+                spawn = self.spawns[index]
+                if consistent[spawn]:
+                    spread = self._certain(spawn)
+                else:
+                    spread = consistent.astype(float)
+                total = spread.sum()
+
+            self.beliefs[index] = spread / total if total > 0 else self._certain(self.spawns[index])
+
+    def most_likely(self, index):
+        """The most probable cell of an enemy and its probability."""
+        cell = int(self.beliefs[index].argmax())
+        return self.map_model.open_cells[cell], float(self.beliefs[index][cell])
+
+    def home_side_mass(self, index):
+        """Probability that an enemy is somewhere on our side of the board."""
+        return float(self.beliefs[index][self.home_side].sum())
+
+    def danger_mass(self, position, radius, indices):
+        """Expected number of the given enemies within radius maze steps of position."""
+        cell = self.map_model.get_open_index(position)
+        if cell < 0:
+            return 0.0
+
+        nearby = self.matrix[cell] <= radius
+        return float(sum(self.beliefs[index][nearby].sum() for index in indices))
+
+
+class LayoutCache:
+    """On-disk store of per-layout precomputation, keyed by a hash of the wall grid and read back with mmap."""
+
+    VERSION = 1
+    MAGIC = b"PCLR"
+    HEADER = struct.Struct("<4sIIII")
+    SUFFIX = ".layout"
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def layout_key(map_model):
+        digest = hashlib.sha1()
+        digest.update(struct.pack("<II", map_model.width, map_model.height))
+        digest.update(sys.byteorder.encode())
+        digest.update(bytes(map_model.walls))
+        return digest.hexdigest()
+
+    def get_path(self, map_model):
+        return os.path.join(self.directory, f"{self.layout_key(map_model)}.v{self.VERSION}{self.SUFFIX}")
+
+    def get_distance_table(self, map_model):
+        if self.directory is None:
+            return DistanceTable(map_model)
+
+        distances = self.load(map_model)
+        if PROFILER is not None:
+            PROFILER.count("layout_cache.hit" if distances is not None else "layout_cache.miss")
+
+        if distances is not None:
+            return DistanceTable(map_model, distances)
+
+        table = DistanceTable(map_model)
+        self.store(map_model, table)
+        return table
+
+    def load(self, map_model):
+        path = self.get_path(map_model)
+        size = len(map_model.open_cells)
+
+        try:
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mapped) != self.HEADER.size + size * size * 2:
+            mapped.close()
+            return None
+
+        magic, version, width, height, stored_size = self.HEADER.unpack_from(mapped)
+        if magic != self.MAGIC or version != self.VERSION or (width, height, stored_size) != (map_model.width, map_model.height, size):
+            mapped.close()
+            return None
+
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+
+        return memoryview(mapped)[self.HEADER.size:].cast("H")
+
+    def store(self, map_model, table):
+        path = self.get_path(map_model)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary_path, "wb") as file:
+                file.write(self.HEADER.pack(self.MAGIC, self.VERSION, map_model.width, map_model.height, table.size))
+                file.write(table.distances.tobytes())
+            os.replace(temporary_path, path)
+            self.evict()
+        except OSError:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+
+            path = os.path.join(self.directory, name)
+            if not name.endswith(f".v{self.VERSION}{self.SUFFIX}"):
+                os.remove(path)  # Written by an older cache format
+                continue
+
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            os.remove(path)
+            total -= size
 
 
 class PositionPath:
-    def __init__(self, game_data, starting, ending, restricted=list()):
+    UNSEEN = 1 << 30
+    DEADLINE_CHECK_INTERVAL = 64  # Expansions between clock reads
+
+    def __init__(self, game_data, starting, ending, restricted=list(), costs=None):
         self.origin = starting
         self.destination = ending
-        self.positions = self._generate_positions(game_data, starting, ending, restricted)
+        self.partial = False
+        self.search = "astar"
+        self.expanded = 0
+
+        if PROFILER is not None:
+            PROFILER.enter("astar")
+
+        self.positions = self._generate_positions(game_data, starting, ending, restricted, costs)
+
+        if PROFILER is not None:
+            PROFILER.exit()
+            PROFILER.record_search(self)
 
         if self.positions and self.positions[0] == starting:
             self.positions.pop(0)
 
         self.current_step = 0
 
+    @classmethod
+    def to_nearest(cls, game_data, starting, targets, restricted=list(), costs=None):
+        """Path to whichever target is closest to starting, found with a single search.
+
+        With per-cell costs the cheapest target wins instead, found with Dijkstra rather than breadth-first search.
+        """
+        map_model = game_data.map_model
+        start_cell = map_model.get_open_index(starting)
+        target_cells = {map_model.get_open_index(position) for position in targets}
+        target_cells.discard(-1)
+        target_cells.discard(start_cell)
+
+        if PROFILER is not None:
+            PROFILER.enter("nearest")
+
+        cells = []
+        partial = False
+        expanded = 0
+        if start_cell >= 0 and target_cells:
+            blocked = {map_model.get_open_index(position) for position in restricted if position is not None}
+            if costs is None:
+                cells, partial, expanded = cls._search_nearest(map_model, start_cell, target_cells, blocked, cls._get_deadline(game_data))
+            else:
+                cells, partial, expanded = cls._search_cheapest(map_model, start_cell, target_cells, blocked, costs, cls._get_deadline(game_data))
+
+        path = cls.from_positions(starting, [map_model.open_cells[cell] for cell in cells[1:]], partial, "nearest", expanded)
+
+        if PROFILER is not None:
+            PROFILER.exit()
+            PROFILER.record_search(path)
+
+        return path
+
+    @classmethod
+    def from_positions(cls, starting, positions, partial=False, search="precomputed", expanded=0):
+        """Wraps an already computed list of steps (excluding starting) in a PositionPath."""
+        path = cls.__new__(cls)
+        path.origin = starting
+        path.positions = positions
+        path.destination = positions[-1] if positions else None
+        path.partial = partial
+        path.search = search
+        path.expanded = expanded
+        path.current_step = 0
+        return path
+
+    @staticmethod
+    def _get_deadline(game_data):
+        return game_data.budget.deadline if game_data.budget is not None else None
+
     def is_empty(self):
         return len(self.positions) == 0
 
@@ -826,58 +2651,157 @@ class PositionPath:
         self.current_step += 1
         return pos
 
-    def _generate_positions(self, game_data, start, end, restricted):
-        walls = set(game_data.walls)
-        result = []
+    def _generate_positions(self, game_data, start, end, restricted, costs):
+        self._manhattan(start, end)  # Validates both endpoints
+
+        map_model = game_data.map_model
+        start_cell = map_model.get_open_index(start)
+        end_cell = map_model.get_open_index(end)
 
-        open_heap = []
-        all_nodes = {}
-        closed = set()
+        if start_cell < 0 or end_cell < 0:
+            return []
 
-        start_node = self.Node(start, None, 0, self._manhattan(start, end))
-        heapq.heappush(open_heap, start_node)
-        all_nodes[start] = start_node
+        blocked = {map_model.get_open_index(position) for position in restricted if position is not None}
+        cells, self.partial, self.expanded = self._search(map_model, start_cell, end_cell, blocked, self._get_deadline(game_data), costs)
+        return [map_model.open_cells[cell] for cell in cells]
+
+    @staticmethod
+    def _search(map_model, start, end, blocked, deadline=None, costs=None):
+        """A* over open cell indices; stale heap entries are skipped instead of being removed.
+
+        Entering a cell costs 1 plus its entry in costs, if given. If the deadline passes first, the path to the
+        expanded cell closest to the end is returned as partial.
+        """
+        adjacency = map_model.adjacency
+        open_x = map_model.open_x
+        open_y = map_model.open_y
+        end_x = open_x[end]
+        end_y = open_y[end]
+
+        g_costs = [PositionPath.UNSEEN] * len(adjacency)
+        parents = [-1] * len(adjacency)
+        g_costs[start] = 0
+
+        h_cost = abs(open_x[start] - end_x) + abs(open_y[start] - end_y)
+        open_heap = [(h_cost, h_cost, start)]
+        best_cell = start
+        best_h_cost = h_cost
+        expanded = 0
 
         while open_heap:
-            current = heapq.heappop(open_heap)
-            closed.add(current.position)
-
-            if current.position == end:
-                node = current
-                while node:
-                    result.insert(0, node.position)
-                    node = node.parent
-                return result
-
-            for neighbor_pos in self._get_neighbors(current.position):
-                if Position.to_tuple(neighbor_pos) in walls or neighbor_pos in closed:
-                    continue
+            f_cost, h_cost, cell = heapq.heappop(open_heap)
+            g_cost = f_cost - h_cost
+
+            if g_cost > g_costs[cell]:
+                continue
+
+            if cell == end:
+                return PositionPath._trace(parents, cell), False, expanded
+
+            if h_cost < best_h_cost:
+                best_cell = cell
+                best_h_cost = h_cost
 
-                if neighbor_pos in restricted:
+            expanded += 1
+            if deadline is not None and expanded % PositionPath.DEADLINE_CHECK_INTERVAL == 0 and time.perf_counter() > deadline:
+                return PositionPath._trace(parents, best_cell), True, expanded
+
+            g_cost += 1
+            for neighbor in adjacency[cell]:
+                neighbor_g_cost = g_cost if costs is None else g_cost + costs[neighbor]
+                if neighbor_g_cost >= g_costs[neighbor] or neighbor in blocked:
                     continue
 
-                g = current.g_cost + 1
-                neighbor_node = all_nodes.get(neighbor_pos)
+                g_costs[neighbor] = neighbor_g_cost
+                parents[neighbor] = cell
+                h_cost = abs(open_x[neighbor] - end_x) + abs(open_y[neighbor] - end_y)
+                heapq.heappush(open_heap, (neighbor_g_cost + h_cost, h_cost, neighbor))
+
+        return [], False, expanded
+
+    @staticmethod
+    def _search_nearest(map_model, start, targets, blocked, deadline=None):
+        """Breadth-first search that stops at the first target it reaches.
+
+        If the deadline passes first, the path to the frontier cell closest to any target is returned as partial.
+        """
+        adjacency = map_model.adjacency
+        parents = [-2] * len(adjacency)
+        parents[start] = -1
+        frontier = [start]
+        expanded = 0
+
+        while frontier:
+            next_frontier = []
+            for cell in frontier:
+                expanded += 1
+                for neighbor in adjacency[cell]:
+                    if parents[neighbor] != -2 or neighbor in blocked:
+                        continue
+
+                    parents[neighbor] = cell
+                    if neighbor in targets:
+                        return PositionPath._trace(parents, neighbor), False, expanded
+
+                    next_frontier.append(neighbor)
+            frontier = next_frontier
+
+            if deadline is not None and frontier and time.perf_counter() > deadline:
+                open_x = map_model.open_x
+                open_y = map_model.open_y
+                closest = min(frontier, key=lambda cell: min(abs(open_x[cell] - open_x[target]) + abs(open_y[cell] - open_y[target]) for target in targets))
+                return PositionPath._trace(parents, closest), True, expanded
+
+        return [], False, expanded
+
+    @staticmethod
+    def _search_cheapest(map_model, start, targets, blocked, costs, deadline=None):
+        """Dijkstra with the same step costs as _search, stopping at the first target it settles.
+
+        If the deadline passes first, the path to the queued cell closest to any target is returned as partial.
+        """
+        adjacency = map_model.adjacency
+        g_costs = [PositionPath.UNSEEN] * len(adjacency)
+        parents = [-1] * len(adjacency)
+        g_costs[start] = 0
+        open_heap = [(0, start)]
+        expanded = 0
+
+        while open_heap:
+            g_cost, cell = heapq.heappop(open_heap)
+            if g_cost > g_costs[cell]:
+                continue
+
+            if cell in targets:
+                return PositionPath._trace(parents, cell), False, expanded
+
+            expanded += 1
+            if deadline is not None and expanded % PositionPath.DEADLINE_CHECK_INTERVAL == 0 and time.perf_counter() > deadline:
+                open_x = map_model.open_x
+                open_y = map_model.open_y
+                closest = min((queued for _, queued in open_heap), key=lambda queued: min(abs(open_x[queued] - open_x[target]) + abs(open_y[queued] - open_y[target]) for target in targets), default=cell)
+                return PositionPath._trace(parents, closest), True, expanded
+
+            g_cost += 1
+            for neighbor in adjacency[cell]:
+                neighbor_g_cost = g_cost + costs[neighbor]
+                if neighbor_g_cost >= g_costs[neighbor] or neighbor in blocked:
+                    continue
 
-                if neighbor_node is None:
-                    neighbor_node = self.Node(
-                        neighbor_pos,
-                        current,
-                        g,
-                        self._manhattan(neighbor_pos, end)
-                    )
-                    all_nodes[neighbor_pos] = neighbor_node
-                    heapq.heappush(open_heap, neighbor_node)
+                g_costs[neighbor] = neighbor_g_cost
+                parents[neighbor] = cell
+                heapq.heappush(open_heap, (neighbor_g_cost, neighbor))
 
-                elif g < neighbor_node.g_cost:
-                    neighbor_node.parent = current
-                    neighbor_node.g_cost = g
-                    neighbor_node.f_cost = g + neighbor_node.h_cost
+        return [], False, expanded
 
-                    open_heap.remove(neighbor_node)
-                    heapq.heapify(open_heap)
-                    heapq.heappush(open_heap, neighbor_node)
+    @staticmethod
+    def _trace(parents, cell):
+        result = []
+        while cell >= 0:
+            result.append(cell)
+            cell = parents[cell]
 
+        result.reverse()
         return result
 
     @staticmethod
@@ -890,31 +2814,588 @@ class PositionPath:
 
         return abs(a.x - b.x) + abs(a.y - b.y)
 
-    @staticmethod
-    def _get_neighbors(pos):
-        return [
-            Position(pos.x + 1, pos.y),
-            Position(pos.x - 1, pos.y),
-            Position(pos.x, pos.y + 1),
-            Position(pos.x, pos.y - 1)
-        ]
-
     def __str__(self):
         if not self.positions:
             return "Path[empty]"
 
         return f"Path[start={self.positions[0]}, end={self.positions[-1]}, steps={len(self.positions)}]"
 
-    class Node:
-        def __init__(self, position, parent, g_cost, h_cost):
-            self.position = position
-            self.parent = parent
-            self.g_cost = g_cost
-            self.h_cost = h_cost
-            self.f_cost = g_cost + h_cost
 
-        def __lt__(self, other):
-            return self.f_cost < other.f_cost
+class IncrementalPlanner:
+    """D* Lite over open cell indices that keeps its search state between turns.
+
+    The search runs from the targets towards the agent, so the agent moving is absorbed by the key modifier,
+    and restricted cells, per-cell danger costs or targets that shift by a cell or two only re-expand the cells
+    whose costs changed. Entering a cell costs 1 plus its entry in costs, as in PositionPath._search. Without
+    restricted cells or costs the distance table is exact, so the path is read off it without searching at all.
+    """
+
+    INFINITY = 1 << 30
+    REPAIR_SHIFT = 2
+    REPAIR_LIMIT = 8
+
+    def __init__(self, map_model, distances):
+        self.map_model = map_model
+        self.distances = distances
+        self.size = len(map_model.open_cells)
+        self.g_costs = None
+        self.rhs = None
+        self.queue = []
+        self.queued = {}
+        self.key_modifier = 0
+        self.start = -1
+        self.last_start = -1
+        self.goals = frozenset()
+        self.blocked = frozenset()
+        self.zero_costs = [0] * self.size
+        self.costs = self.zero_costs
+        self.replans = 0
+        self.repairs = 0
+        self.descents = 0
+        self.expanded = 0
+
+    def plan(self, starting, targets, restricted=list(), budget=None, costs=None):
+        if PROFILER is None:
+            return self._plan(starting, targets, restricted, budget, costs)
+
+        PROFILER.enter("planner")
+        path = self._plan(starting, targets, restricted, budget, costs)
+        PROFILER.exit()
+        PROFILER.record_search(path)
+        return path
+
+    def _plan(self, starting, targets, restricted, budget, costs):
+        map_model = self.map_model
+        start = map_model.get_open_index(starting)
+        goals = frozenset(map_model.get_open_index(position) for position in targets) - {start, -1}
+        blocked = frozenset(map_model.get_open_index(position) for position in restricted if position is not None) - {start, -1}
+
+        if start < 0 or not goals:
+            return PositionPath.from_positions(starting, [])
+
+        if not blocked and costs is None:
+            self.descents += 1
+            return PositionPath.from_positions(starting, [map_model.open_cells[cell] for cell in self._descend(start, goals)], search="descent")
+
+        costs = self.zero_costs if costs is None else costs
+        if self.g_costs is None or not self._can_repair(goals):
+            self._reset(start, goals, blocked, costs)
+        else:
+            self._repair(start, goals, blocked, costs)
+
+        # An interrupted search keeps its queue, so the next call resumes where this one stopped
+        expanded = self.expanded
+        completed = self._compute_shortest_path(budget.deadline if budget is not None else None)
+        return PositionPath.from_positions(starting, [map_model.open_cells[cell] for cell in self._extract_path()], not completed, "dstar", self.expanded - expanded)
+
+    def _descend(self, start, goals):
+        """Follows strictly decreasing table distances from start to the closest goal."""
+        size = self.size
+        distances = self.distances.distances
+        adjacency = self.map_model.adjacency
+
+        goal = min(goals, key=lambda cell: distances[start * size + cell])
+        remaining = distances[start * size + goal]
+        if remaining == DistanceTable.UNREACHABLE:
+            return []
+
+        cell = start
+        result = []
+        while remaining > 0:
+            remaining -= 1
+            for neighbor in adjacency[cell]:
+                if distances[neighbor * size + goal] == remaining:
+                    cell = neighbor
+                    break
+
+            result.append(cell)
+
+        return result
+
+    def _can_repair(self, goals):
+        added = goals - self.goals
+        if len(added) + len(self.goals - goals) > self.REPAIR_LIMIT:
+            return False
+
+        open_x = self.map_model.open_x
+        open_y = self.map_model.open_y
+        for cell in added:
+            if not any(abs(open_x[cell] - open_x[goal]) + abs(open_y[cell] - open_y[goal]) <= self.REPAIR_SHIFT for goal in self.goals):
+                return False
+
+        return True
+
+    def _reset(self, start, goals, blocked, costs):
+        self.g_costs = [self.INFINITY] * self.size
+        self.rhs = [self.INFINITY] * self.size
+        self.queue = []
+        self.queued = {}
+        self.key_modifier = 0
+        self.start = self.last_start = start
+        self.goals = goals
+        self.blocked = blocked
+        self.costs = costs
+        self.replans += 1
+
+        for goal in goals:
+            if goal not in blocked:
+                self.rhs[goal] = 0
+                self._push(goal)
+
+    def _repair(self, start, goals, blocked, costs):
+        if start != self.start:
+            self.key_modifier += self._heuristic(self.last_start, start)
+            self.last_start = self.start = start
+
+        adjacency = self.map_model.adjacency
+        changed = set(goals ^ self.goals)
+        for cell in blocked ^ self.blocked:
+            changed.add(cell)
+            changed.update(adjacency[cell])
+
+        # A cell's cost is paid on entering it, so only the cells next to it see a different step cost
+        if costs is not self.costs:
+            previous_costs = self.costs
+            for cell in range(self.size):
+                if costs[cell] != previous_costs[cell]:
+                    changed.update(adjacency[cell])
+
+        self.goals = goals
+        self.blocked = blocked
+        self.costs = costs
+        self.repairs += 1
+
+        for cell in changed:
+            self._update_vertex(cell)
+
+    def _heuristic(self, a, b):
+        distance = self.distances.distances[a * self.size + b]
+        if distance == DistanceTable.UNREACHABLE:
+            return abs(self.map_model.open_x[a] - self.map_model.open_x[b]) + abs(self.map_model.open_y[a] - self.map_model.open_y[b])
+
+        return distance
+
+    def _key(self, cell):
+        cost = min(self.g_costs[cell], self.rhs[cell])
+        return cost + self._heuristic(self.start, cell) + self.key_modifier, cost
+
+    def _push(self, cell):
+        key = self._key(cell)
+        self.queued[cell] = key
+        heapq.heappush(self.queue, (key[0], key[1], cell))
+
+    def _top_key(self):
+        queue = self.queue
+        while queue:
+            first, second, cell = queue[0]
+            if self.queued.get(cell) == (first, second):
+                return first, second
+
+            heapq.heappop(queue)  # Stale entry
+
+        return self.INFINITY, self.INFINITY
+
+    def _update_vertex(self, cell):
+        if cell not in self.goals or cell in self.blocked:
+            best = self.INFINITY
+            if cell not in self.blocked:
+                g_costs = self.g_costs
+                costs = self.costs
+                for neighbor in self.map_model.adjacency[cell]:
+                    cost = g_costs[neighbor] + 1 + costs[neighbor]
+                    if cost < best and neighbor not in self.blocked:
+                        best = cost
+
+            self.rhs[cell] = best
+        else:
+            self.rhs[cell] = 0
+
+        if self.g_costs[cell] != self.rhs[cell]:
+            self._push(cell)
+        else:
+            self.queued.pop(cell, None)
+
+    def _compute_shortest_path(self, deadline=None):
+        adjacency = self.map_model.adjacency
+        g_costs = self.g_costs
+        rhs = self.rhs
+        start = self.start
+        expanded = 0
+
+        while True:
+            top_key = self._top_key()
+            if top_key[0] >= self.INFINITY:
+                return True
+
+            if top_key >= self._key(start) and rhs[start] == g_costs[start]:
+                return True
+
+            if deadline is not None and expanded % PositionPath.DEADLINE_CHECK_INTERVAL == 0 and expanded and time.perf_counter() > deadline:
+                return False
+
+            _, _, cell = heapq.heappop(self.queue)
+            del self.queued[cell]
+            self.expanded += 1
+            expanded += 1
+
+            new_key = self._key(cell)
+            if top_key < new_key:
+                self._push(cell)
+            elif g_costs[cell] > rhs[cell]:
+                g_costs[cell] = rhs[cell]
+                for neighbor in adjacency[cell]:
+                    self._update_vertex(neighbor)
+            else:
+                g_costs[cell] = self.INFINITY
+                self._update_vertex(cell)
+                for neighbor in adjacency[cell]:
+                    self._update_vertex(neighbor)
+
+    def _extract_path(self):
+        adjacency = self.map_model.adjacency
+        g_costs = self.g_costs
+        costs = self.costs
+        cell = self.start
+        result = []
+
+        if g_costs[cell] >= self.INFINITY:
+            return result
+
+        while cell not in self.goals:
+            best = min((neighbor for neighbor in adjacency[cell] if neighbor not in self.blocked), key=lambda neighbor: g_costs[neighbor] + costs[neighbor], default=-1)
+            if best < 0 or g_costs[best] >= g_costs[cell]:
+                return result  # Only reachable after an interrupted search
+
+            result.append(best)
+            cell = best
+
+        return result
+
+
+class SimulatorState:
+    """Everything a simulated ply can change. Food and capsules are bitsets over open cell indices, and -1 marks
+    an agent whose position we don't know; it takes no part in the simulation."""
+
+    __slots__ = ("positions", "scared", "carrying", "food", "capsules", "score")
+
+    def __init__(self, positions, scared, carrying, food, capsules, score):
+        self.positions = positions
+        self.scared = scared
+        self.carrying = carrying
+        self.food = food
+        self.capsules = capsules
+        self.score = score
+
+    def key(self):
+        # Everything apply can change, so transpositions never merge states that play out differently
+        return tuple(self.positions), tuple(self.scared), tuple(self.carrying), self.food, self.capsules, self.score
+
+
+class GameSimulator:
+    """Capture rules over SimulatorState with in-place apply and undo, for lookahead without copying game states.
+
+    Moves, eating food and capsules, depositing, scared timers, captures and respawns follow the contest rules.
+    The one simplification is that a captured pacman's carried food is lost instead of being dropped back onto
+    the board.
+    """
+
+    SCARED_TIME = 40
+
+    def __init__(self, map_model, game_state):
+        self.map_model = map_model
+        self.adjacency = map_model.adjacency
+        self.red_side = bytearray(is_red_side(x, map_model.width) for x in map_model.open_x)
+        self.agents = range(game_state.get_num_agents())
+        self.red = [game_state.is_on_red_team(index) for index in self.agents]
+        self.spawns = [map_model.get_open_index(Position.from_tuple(game_state.get_initial_agent_position(index))) for index in self.agents]
+
+    def state_from(self, game_data):
+        game_state = game_data.game_state
+        map_model = self.map_model
+        positions = []
+        for index in self.agents:
+            position = game_state.get_agent_position(index)
+            positions.append(map_model.get_open_index(Position.from_tuple(position)) if position is not None else -1)
+
+        food = 0
+        for grid in (game_state.get_red_food(), game_state.get_blue_food()):
+            for position in grid.as_list():
+                food |= 1 << map_model.get_open_index(Position.from_tuple(position))
+
+        capsules = 0
+        for position in game_state.get_capsules():
+            capsules |= 1 << map_model.get_open_index(Position.from_tuple(position))
+
+        return SimulatorState(
+            positions,
+            [game_state.get_agent_state(index).scared_timer for index in self.agents],
+            [game_state.get_agent_state(index).num_carrying for index in self.agents],
+            food,
+            capsules,
+            game_state.get_score()
+        )
+
+    def legal_moves(self, state, agent):
+        """Cells the agent can be on after its move, staying put first."""
+        cell = state.positions[agent]
+        return (cell,) + self.adjacency[cell]
+
+    def is_pacman(self, state, agent):
+        return self.red_side[state.positions[agent]] != self.red[agent]
+
+    def apply(self, state, agent, cell):
+        """Moves agent to cell and returns what undo needs: the few values a single ply can change."""
+        positions = state.positions
+        scared = state.scared
+        carrying = state.carrying
+        record = (tuple(positions), tuple(scared), tuple(carrying), state.food, state.capsules, state.score)
+
+        red = self.red[agent]
+        positions[agent] = cell
+        if scared[agent] > 0:
+            scared[agent] -= 1
+
+        pacman = self.red_side[cell] != red
+        bit = 1 << cell
+        if not pacman:
+            if carrying[agent]:
+                state.score += carrying[agent] if red else -carrying[agent]
+                carrying[agent] = 0
+        else:
+            if state.food & bit:
+                state.food ^= bit
+                carrying[agent] += 1
+
+            if state.capsules & bit:
+                state.capsules ^= bit
+                for other in self.agents:
+                    if self.red[other] != red:
+                        scared[other] = GameSimulator.SCARED_TIME
+
+        for other in self.agents:
+            if self.red[other] == red or positions[other] != cell:
+                continue
+
+            # Whoever is the ghost wins unless it is scared
+            ghost, invader = (other, agent) if pacman else (agent, other)
+            if scared[ghost] > 0:
+                self._respawn(state, ghost)
+            else:
+                self._respawn(state, invader)
+
+            if positions[agent] != cell:
+                break
+
+        return record
+
+    def undo(self, state, record):
+        positions, scared, carrying, state.food, state.capsules, state.score = record
+        state.positions[:] = positions
+        state.scared[:] = scared
+        state.carrying[:] = carrying
+
+    def _respawn(self, state, agent):
+        state.positions[agent] = self.spawns[agent]
+        state.scared[agent] = 0
+        state.carrying[agent] = 0
+
+
+class MonteCarloSearch:
+    """Optional search-based decision mode: UCT over GameSimulator plies until the turn deadline.
+
+    Only our agent and the enemies we can see take part in the simulation, in turn order; enemies minimize what we
+    maximize. Leaves are scored with a cheap evaluation instead of random playouts, so more of the budget goes into
+    the tree. Tree statistics live in a transposition table keyed on the simulator state, shared across turns and
+    capped at TABLE_SIZE entries with least recently used eviction. The table only maps a state to a slot; the
+    moves, visits and values of its children sit in flat arrays at MAX_MOVES entries per slot, so a full table adds
+    almost nothing for the garbage collector to scan.
+    """
+
+    TABLE_SIZE = 20_000  # A full table costs about a millisecond per agent in every full garbage collection
+    MAX_MOVES = 5  # Staying put and the four directions
+    MAX_DEPTH = 12
+    EXPLORATION = 1.4
+    SAFETY_MARGIN = 0.005  # Seconds kept free for everything after the search
+    CARRY_LIMIT = 3  # Carried pellets after which the evaluation pulls towards home, like DepositingFoodGoal
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.simulator = None
+        self.table = OrderedDict()
+        self.moves = array('i', [-1]) * (MonteCarloSearch.TABLE_SIZE * MonteCarloSearch.MAX_MOVES)
+        self.visits = array('I', [0]) * len(self.moves)
+        self.values = array('d', [0.0]) * len(self.moves)
+        self.home_distances = {}
+        self.iterations = 0
+        self.seconds = 0.0
+        self.slowest_turn = 0.0
+        self.turns = 0
+        self.table_hits = 0
+        self.evictions = 0
+
+    def reset(self, game_state):
+        self.simulator = GameSimulator(self.agent.map_model, game_state)
+        self.table.clear()
+        self.home_distances.clear()
+
+    def choose(self, game_data):
+        agent = self.agent
+        simulator = self.simulator
+        state = simulator.state_from(game_data)
+        actors = [agent.index] + [index for index in agent.get_opponents(game_data.game_state) if state.positions[index] >= 0]
+        root_cell = state.positions[agent.index]
+        deadline = game_data.budget.deadline - MonteCarloSearch.SAFETY_MARGIN
+
+        started = time.perf_counter()
+        iterations = 0
+        while iterations == 0 or time.perf_counter() < deadline:
+            self._iterate(state, actors, root_cell)
+            iterations += 1
+
+        self.iterations += iterations
+        self.seconds += time.perf_counter() - started
+        self.turns += 1
+        if PROFILER is not None:
+            PROFILER.count("mcts.iterations", iterations)
+
+        root = self.table.get((agent.index, state.key()))
+        self.slowest_turn = max(self.slowest_turn, game_data.budget.elapsed())
+        if root is None:
+            return None
+
+        # The most visited move is the most robust choice
+        moves = self.moves
+        offsets = range(root * MonteCarloSearch.MAX_MOVES, (root + 1) * MonteCarloSearch.MAX_MOVES)
+        cell = moves[max((offset for offset in offsets if moves[offset] >= 0), key=self.visits.__getitem__)]
+        if cell == root_cell:
+            return Direction.STOP
+
+        return Direction.from_position(self.agent.map_model.open_cells[root_cell], self.agent.map_model.open_cells[cell])
+
+    def report(self):
+        return {
+            "iterations": self.iterations,
+            "iterations_per_second": round(self.iterations / self.seconds, 1) if self.seconds else 0.0,
+            "iterations_per_turn": round(self.iterations / self.turns, 1) if self.turns else 0.0,
+            "slowest_turn_ms": round(self.slowest_turn * 1000, 3),
+            "table_entries": len(self.table),
+            "table_hits": self.table_hits,
+            "evictions": self.evictions
+        }
+
+    def _iterate(self, state, actors, root_cell):
+        simulator = self.simulator
+        path = []
+        records = []
+
+        for depth in range(MonteCarloSearch.MAX_DEPTH):
+            actor = actors[depth % len(actors)]
+            key = (actor, state.key())
+
+            slot = self.table.get(key)
+            if slot is None:
+                self._store(key, simulator.legal_moves(state, actor))
+                break
+
+            self.table_hits += 1
+            self.table.move_to_end(key)
+            offset = self._select(slot, 1.0 if actor == actors[0] else -1.0)
+            path.append(offset)
+            records.append(simulator.apply(state, actor, self.moves[offset]))
+
+        value = self._evaluate(state, actors, root_cell)
+        visits = self.visits
+        values = self.values
+        for offset in path:
+            visits[offset] += 1
+            values[offset] += value
+
+        for record in reversed(records):
+            simulator.undo(state, record)
+
+    def _select(self, slot, sign):
+        """Offset of the child to descend into, by UCB1."""
+        moves = self.moves
+        visits = self.visits
+        values = self.values
+        start = slot * MonteCarloSearch.MAX_MOVES
+        end = start + MonteCarloSearch.MAX_MOVES
+        log_total = math.log(sum(visits[start:end]) + 1)
+        best_offset = start
+        best_score = -math.inf
+
+        for offset in range(start, end):
+            if moves[offset] < 0:
+                break
+
+            child_visits = visits[offset]
+            if child_visits == 0:
+                return offset
+
+            score = sign * values[offset] / child_visits + MonteCarloSearch.EXPLORATION * math.sqrt(log_total / child_visits)
+            if score > best_score:
+                best_offset = offset
+                best_score = score
+
+        return best_offset
+
+    def _store(self, key, legal_moves):
+        # A full table hands the least recently used state's slot to the new one
+        if len(self.table) < MonteCarloSearch.TABLE_SIZE:
+            slot = len(self.table)
+        else:
+            slot = self.table.popitem(last=False)[1]
+            self.evictions += 1
+
+        self.table[key] = slot
+        start = slot * MonteCarloSearch.MAX_MOVES
+        for offset in range(start, start + MonteCarloSearch.MAX_MOVES):
+            index = offset - start
+            self.moves[offset] = legal_moves[index] if index < len(legal_moves) else -1
+            self.visits[offset] = 0
+            self.values[offset] = 0.0
+
+    def _home_distance(self, position):
+        distance = self.home_distances.get(position)
+        if distance is None:
+            border = self.agent.snapshot.agent_color.home_border_cells
+            distance = min(self.agent.interpreter.get_distances(position, border)) if border else 0
+            self.home_distances[position] = distance
+
+        return distance
+
+    def _evaluate(self, state, actors, root_cell):
+        """Our team's view of a state: score, carried food, progress to food or home and enemy contact."""
+        agent = self.agent
+        simulator = self.simulator
+        interpreter = agent.interpreter
+        open_cells = agent.map_model.open_cells
+        me = agent.index
+        cell = state.positions[me]
+        carrying = state.carrying[me]
+        value = (1 if agent.is_red else -1) * state.score * 100.0 + carrying * 20.0
+
+        # Respawning means we were eaten somewhere along the simulated line
+        if cell == simulator.spawns[me] and interpreter.distances.distances[root_cell * interpreter.distances.size + cell] > 1:
+            return value - 500.0
+
+        position = open_cells[cell]
+        closest_food = interpreter.food_index.nearest(position)
+        if carrying >= MonteCarloSearch.CARRY_LIMIT or closest_food is None:
+            value -= self._home_distance(position) * 2.0
+        else:
+            value -= closest_food[1]
+
+        pacman = simulator.is_pacman(state, me)
+        for enemy in actors[1:]:
+            distance = interpreter.distances.distances[cell * interpreter.distances.size + state.positions[enemy]]
+            enemy_pacman = simulator.is_pacman(state, enemy)
+            if pacman and not enemy_pacman and state.scared[enemy] <= 1 and distance <= 2:
+                value -= (3 - distance) * 100.0
+            elif enemy_pacman and not pacman and state.scared[me] == 0:
+                value -= distance * 5.0
+
+        return value
 
 
 class Direction(Enum):
@@ -942,19 +3423,25 @@ class Direction(Enum):
 
     @staticmethod
     def from_position(current_position, next_step):
-        for direction in Direction.valid_directions():
-            directional = direction.apply_modifier(current_position)
-
-            if directional.__eq__(next_step):
-                return direction
-
-        return None
+        return DIRECTION_OFFSETS.get((next_step.x - current_position.x, next_step.y - current_position.y))
 
     def __str__(self):
         name = self.name.lower()
         return name[0].upper() + name[1:]
 
 
+DIRECTION_OFFSETS = {
+    (0, 1): Direction.NORTH,
+    (0, -1): Direction.SOUTH,
+    (1, 0): Direction.EAST,
+    (-1, 0): Direction.WEST
+}
+
+
+PROFILER = Profiler(os.environ.get("PACLERS_PROFILE_TRACE")) if is_option_enabled(os.environ.get("PACLERS_PROFILE", "0")) else None
+LAYOUT_CACHE = LayoutCache(os.environ.get("PACLERS_LAYOUT_CACHE", os.path.join(tempfile.gettempdir(), "paclers-layouts")) or None)
+
+
 class GameState(Enum):
     FINDING_FOOD = auto()
     FINDING_CAPSULE = auto()
@@ -963,4 +3450,26 @@ class GameState(Enum):
     DEFENSIVE_FLEEING = auto()  # When we're on home territory
     DEFENDING = auto()
     ATTACKING = auto()
-    WANDER = auto()
\ No newline at end of file
+    WANDER = auto()
+
+
+class ChangeEvent(Enum):
+    FOOD_REMOVED = auto()  # Payload: (x, y)
+    FOOD_ADDED = auto()  # Payload: (x, y)
+    CAPSULE_REMOVED = auto()  # Payload: (x, y)
+    CAPSULE_ADDED = auto()  # Payload: (x, y)
+    ENEMY_MOVED = auto()  # Payload: (agent index, previous position, position), positions are None when not visible
+    ENEMY_SCARED_CHANGED = auto()  # Payload: (agent index, scared timer)
+
+
+# Goals that can act or trigger a transition in each state; every other goal would return without doing anything
+GOAL_SCHEDULE = {
+    GameState.FINDING_FOOD: (FindingFoodGoal, DepositingFoodGoal, CapsuleFindGoal, OffensiveFleeingGoal, DefensiveFleeingGoal),
+    GameState.FINDING_CAPSULE: (DepositingFoodGoal, OffensiveFleeingGoal, DefensiveFleeingGoal),
+    GameState.DEPOSITING_FOOD: (FindingFoodGoal, DepositingFoodGoal, CapsuleFindGoal, OffensiveFleeingGoal, DefensiveFleeingGoal),
+    GameState.OFFENSIVE_FLEEING: (DepositingFoodGoal, CapsuleFindGoal, OffensiveFleeingGoal, DefensiveFleeingGoal),
+    GameState.DEFENSIVE_FLEEING: (DepositingFoodGoal, CapsuleFindGoal, OffensiveFleeingGoal, DefensiveFleeingGoal),
+    GameState.DEFENDING: (DepositingFoodGoal, CapsuleFindGoal, OffensiveFleeingGoal, DefensiveFleeingGoal, DefendingGoal),
+    GameState.ATTACKING: (FindingFoodGoal, DepositingFoodGoal, CapsuleFindGoal, AttackingGoal, DefensiveFleeingGoal),
+    GameState.WANDER: (DepositingFoodGoal, CapsuleFindGoal, OffensiveFleeingGoal, DefensiveFleeingGoal)
+}
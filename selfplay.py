@@ -0,0 +1,303 @@
+"""Headless self-play for parameter sweeps: plays create_team configurations against each other on a process pool.
+
+A team is NAME[:OPTION=VALUE,...]. Plain options are passed to create_team, dotted ones override a class
+constant of my_team for that team only, and path=FILE plays a different team file:
+
+    python selfplay.py --team base --team deposit5:FindingFoodGoal.DEPOSIT_TRIGGER=5 \\
+        --team mcts:first_decision=mcts --layouts defaultCapture,RANDOM --seeds 20 --output sweep.json
+
+Every pair of teams meets on every layout and seed from both sides; RANDOM becomes RANDOM<seed>, the contest
+maze generator. Games run through the local contest package and each one lives in its own process, so class
+overrides never leak between teams and throughput grows with --workers. Turn latencies come from the agents'
+own telemetry and are merged across games per team and agent.
+"""
+import argparse
+import ast
+import importlib.util
+import inspect
+import itertools
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from contest import capture
+
+from benchmarks import git_revision
+from my_team import LatencyHistogram
+
+DEFAULT_TEAM_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "my_team.py")
+
+TEAM_MODULE = '''import importlib.util
+import inspect
+
+_spec = importlib.util.spec_from_file_location({module_name!r}, {path!r})
+team = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(team)
+
+for _name, _value in {overrides!r}.items():
+    _owner, _attribute = _name.rsplit(".", 1)
+    setattr(getattr(team, _owner), _attribute, _value)
+
+_OPTIONS = {options!r}
+if "telemetry" in inspect.signature(team.create_team).parameters:
+    _OPTIONS = {{"telemetry": "1", "telemetry_path": {telemetry_path!r}, **_OPTIONS}}
+
+
+def create_team(first_index, second_index, is_red, **options):
+    return team.create_team(first_index, second_index, is_red, **{{**options, **_OPTIONS}})
+'''
+
+
+class TeamConfig:
+    """One side of a match: a team file, its create_team options and class constant overrides."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.name, _, option_text = spec.partition(":")
+        self.path = DEFAULT_TEAM_PATH
+        self.options = {}
+        self.overrides = {}
+
+        for option in filter(None, (part.strip() for part in option_text.split(","))):
+            key, separator, value = option.partition("=")
+            if not separator:
+                raise ValueError(f"{spec}: expected OPTION=VALUE, got {option!r}")
+
+            if key == "path":
+                self.path = os.path.abspath(value)
+            elif "." in key:
+                self.overrides[key] = self.parse_value(value)
+            else:
+                # create_team options arrive as strings from the contest command line as well
+                self.options[key] = value
+
+    @staticmethod
+    def parse_value(value):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+
+    def validate(self):
+        spec = importlib.util.spec_from_file_location("selfplay_validate", self.path)
+        team = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(team)
+
+        parameters = inspect.signature(team.create_team).parameters
+        for key in self.options:
+            if key not in parameters:
+                raise ValueError(f"{self.spec}: create_team has no option {key!r}")
+
+        for name in self.overrides:
+            owner, attribute = name.rsplit(".", 1)
+            if not hasattr(getattr(team, owner, None), attribute):
+                raise ValueError(f"{self.spec}: {name} does not exist in {os.path.basename(self.path)}")
+
+    def write_module(self, directory, module_name, telemetry_path):
+        path = os.path.join(directory, f"{module_name}.py")
+        with open(path, "w") as file:
+            file.write(TEAM_MODULE.format(
+                module_name=module_name, path=self.path, overrides=self.overrides,
+                options=self.options, telemetry_path=telemetry_path
+            ))
+
+        return path
+
+
+def play_game(job):
+    directory = tempfile.mkdtemp(prefix="paclers-selfplay-")
+    telemetry_paths = {color: os.path.join(directory, f"{color}.jsonl") for color in ("red", "blue")}
+    result = {key: job[key] for key in ("red", "blue", "layout", "seed")}
+
+    try:
+        team_paths = {
+            color: TeamConfig(job[f"{color}_spec"]).write_module(directory, f"selfplay_{job['id']}_{color}", telemetry_paths[color])
+            for color in ("red", "blue")
+        }
+
+        random.seed(job["seed"])
+        started = time.perf_counter()
+        options = capture.read_command([
+            "-r", team_paths["red"], "-b", team_paths["blue"], "-l", job["layout"],
+            "-n", "1", "-i", str(job["length"]), "-Q", "-c"
+        ])
+        game = capture.run_games(**options)[0]
+
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        result["score"] = game.state.data.score
+        result["crashed"] = bool(getattr(game, "agent_crashed", False))
+    except Exception as error:  # A broken configuration costs one game, not the sweep
+        result["error"] = f"{type(error).__name__}: {error}"
+    finally:
+        result["telemetry"] = {color: read_telemetry(path) for color, path in telemetry_paths.items()}
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return result
+
+
+def read_telemetry(path):
+    try:
+        with open(path) as file:
+            return [json.loads(line) for line in file if line.strip()]
+    except OSError:
+        return []
+
+
+def build_jobs(teams, layouts, seeds, length):
+    pairings = list(itertools.combinations(teams, 2)) or [(teams[0], teams[0])]
+    jobs = []
+
+    for seed in seeds:
+        for layout in layouts:
+            layout_name = f"RANDOM{seed}" if layout == "RANDOM" else layout
+            for first, second in pairings:
+                for red, blue in dict.fromkeys(((first, second), (second, first))):
+                    jobs.append({
+                        "id": len(jobs), "red": red.name, "blue": blue.name, "red_spec": red.spec, "blue_spec": blue.spec,
+                        "layout": layout_name, "seed": seed, "length": length
+                    })
+
+    return jobs
+
+
+def score_distribution(scores):
+    ordered = sorted(scores)
+
+    def percentile(fraction):
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    return {
+        "mean": round(statistics.fmean(ordered), 3),
+        "stdev": round(statistics.pstdev(ordered), 3),
+        "min": ordered[0],
+        "p10": percentile(0.10),
+        "p50": percentile(0.50),
+        "p90": percentile(0.90),
+        "max": ordered[-1],
+        "histogram": dict(sorted(Counter(ordered).items()))
+    }
+
+
+def aggregate(results):
+    scores = defaultdict(list)
+    outcomes = defaultdict(Counter)
+    head_to_head = defaultdict(lambda: defaultdict(Counter))
+    latencies = defaultdict(lambda: defaultdict(LatencyHistogram))
+
+    for result in results:
+        for color, sign in (("red", 1), ("blue", -1)):
+            name = result[color]
+            for report in result["telemetry"][color]:
+                if "latency_histogram" in report:
+                    latencies[name][f"agent{report['agent']}"].merge(LatencyHistogram.from_state(report["latency_histogram"]))
+
+            if "error" in result:
+                outcomes[name]["errors"] += 1
+                continue
+
+            score = sign * result["score"]
+            outcome = "wins" if score > 0 else "losses" if score < 0 else "ties"
+            scores[name].append(score)
+            outcomes[name][outcome] += 1
+            outcomes[name]["crashes"] += result["crashed"]
+            head_to_head[name][result["blue" if color == "red" else "red"]][outcome] += 1
+
+    teams = {}
+    for name in sorted(set(outcomes)):
+        played = len(scores[name])
+        teams[name] = {
+            "games": played,
+            "wins": outcomes[name]["wins"],
+            "losses": outcomes[name]["losses"],
+            "ties": outcomes[name]["ties"],
+            "crashes": outcomes[name]["crashes"],
+            "errors": outcomes[name]["errors"],
+            # Ties count as half a win, as usual for round robins
+            "win_rate": round((outcomes[name]["wins"] + outcomes[name]["ties"] / 2) / played, 4) if played else None,
+            "score": score_distribution(scores[name]) if played else None,
+            "latency": {agent: histogram.summary() for agent, histogram in sorted(latencies[name].items())},
+            "versus": {opponent: dict(counts) for opponent, counts in sorted(head_to_head[name].items())}
+        }
+
+    return teams
+
+
+def print_report(report):
+    print(f"{report['games']} games in {report['seconds']}s on {report['workers']} workers ({report['games_per_sec']} games/s)")
+
+    for name, stats in report["teams"].items():
+        if stats["games"]:
+            score = stats["score"]
+            print(f"  {name:<20} win rate {stats['win_rate']:.3f}  W/L/T {stats['wins']}/{stats['losses']}/{stats['ties']}  score mean {score['mean']:+.2f} p10 {score['p10']:+} p90 {score['p90']:+}  crashes {stats['crashes']}  errors {stats['errors']}")
+        else:
+            print(f"  {name:<20} no finished games, errors {stats['errors']}")
+
+        for agent, latency in stats["latency"].items():
+            print(f"    {agent}  turns {latency['count']}  p50={latency['p50_ms']:.2f}ms  p95={latency['p95_ms']:.2f}ms  p99={latency['p99_ms']:.2f}ms  max={latency['max_ms']:.2f}ms")
+
+    for result in report["results"]:
+        if "error" in result:
+            print(f"  error in {result['red']} vs {result['blue']} on {result['layout']} seed {result['seed']}: {result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--team", action="append", dest="teams", help="NAME[:OPTION=VALUE,...], repeat for every configuration")
+    parser.add_argument("--layouts", default="defaultCapture,RANDOM", help="comma separated contest layouts, RANDOM for a generated maze per seed")
+    parser.add_argument("--seeds", type=int, default=10, help="seeds per layout and pairing")
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--length", type=int, default=1200, help="moves per game")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes playing games in parallel")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    arguments = parser.parse_args()
+
+    try:
+        teams = [TeamConfig(spec) for spec in arguments.teams or ["base"]]
+        for team in teams:
+            team.validate()
+    except (ValueError, AttributeError) as error:
+        parser.error(str(error))
+
+    if len({team.name for team in teams}) != len(teams):
+        parser.error("team names must be unique")
+
+    jobs = build_jobs(teams, arguments.layouts.split(","), range(arguments.seed, arguments.seed + arguments.seeds), arguments.length)
+    results = []
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=arguments.workers) as executor:
+        futures = [executor.submit(play_game, job) for job in jobs]
+        for future in as_completed(futures):
+            results.append(future.result())
+            print(f"\r{len(results)}/{len(jobs)} games", end="", flush=True)
+
+    print()
+    seconds = time.perf_counter() - started
+    results.sort(key=lambda result: (result["seed"], result["layout"], result["red"], result["blue"]))
+
+    report = {
+        "revision": git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workers": arguments.workers,
+        "games": len(results),
+        "seconds": round(seconds, 2),
+        "games_per_sec": round(len(results) / seconds, 3),
+        "teams": aggregate(results),
+        "results": [{key: value for key, value in result.items() if key != "telemetry"} for result in results]
+    }
+
+    print_report(report)
+
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Slow but obviously correct references the primitives are checked against."""
+import heapq
+from collections import deque
+
+COST_CHOICES = (0, 0, 0, 1, 4, 9)
+
+
+def breadth_first(map_model, start, blocked=frozenset()):
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        for neighbor in map_model.adjacency[cell]:
+            if neighbor not in distances and neighbor not in blocked:
+                distances[neighbor] = distances[cell] + 1
+                queue.append(neighbor)
+
+    return distances
+
+
+def dijkstra(map_model, start, costs, blocked=frozenset()):
+    distances = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        distance, cell = heapq.heappop(heap)
+        if distance > distances[cell]:
+            continue
+
+        for neighbor in map_model.adjacency[cell]:
+            step = distance + 1 + costs[neighbor]
+            if neighbor not in blocked and step < distances.get(neighbor, step + 1):
+                distances[neighbor] = step
+                heapq.heappush(heap, (step, neighbor))
+
+    return distances
+
+
+def walk(map_model, start, positions, blocked=frozenset()):
+    """Cells visited by a path, checking that every step moves to an open, unblocked neighbor."""
+    cells = []
+    previous = start
+    for position in positions:
+        cell = map_model.get_open_index(position)
+        assert cell in map_model.adjacency[previous] and cell not in blocked
+        cells.append(cell)
+        previous = cell
+
+    return cells
+
+
+def random_costs(rng, map_model):
+    return None if rng.random() < 0.3 else [rng.choice(COST_CHOICES) for _ in map_model.open_cells]
@@ -0,0 +1,19 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import BenchmarkWalls  # noqa: E402
+from my_team import DistanceTable, MapModel  # noqa: E402
+
+LAYOUTS = [(20, 10, 0.2, 1), (24, 12, 0.3, 2), (32, 16, 0.25, 3)]
+
+
+@pytest.fixture(params=LAYOUTS, ids=lambda layout: "{}x{}-{}-{}".format(*layout))
+def layout(request):
+    """A generated map, its distance table and a random generator seeded per layout."""
+    map_model = MapModel(BenchmarkWalls(*request.param))
+    return map_model, DistanceTable(map_model), random.Random(request.param[3])
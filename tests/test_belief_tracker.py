@@ -0,0 +1,92 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks import BenchmarkWalls
+from my_team import BeliefTracker, DistanceTable, MapModel, Position, RedAgentColor
+
+pytest.importorskip("numpy")  # The tracker only exists with NumPy
+
+ENEMY_SPAWNS = {1: (18, 8), 3: (18, 7)}
+TEAM_POSITIONS = [(2, 2), (2, 7)]
+
+
+class SonarGameState:
+    """Only what BeliefTracker.update reads: noisy distances and which enemies are in sight."""
+
+    def __init__(self, readings, seen=()):
+        self.readings = readings
+        self.seen = dict(seen)
+
+    def get_num_agents(self):
+        return 4
+
+    def get_agent_distances(self):
+        return self.readings
+
+    def get_agent_state(self, index):
+        return SimpleNamespace(get_position=lambda: self.seen.get(index))
+
+
+def make_tracker():
+    map_model = MapModel(BenchmarkWalls(20, 10, 0, 1))
+    return map_model, BeliefTracker(map_model, DistanceTable(map_model), ENEMY_SPAWNS, RedAgentColor("red", map_model))
+
+
+def manhattan(first, second):
+    return abs(first[0] - second[0]) + abs(first[1] - second[1])
+
+
+def test_each_update_spreads_only_the_enemies_that_moved():
+    _, tracker = make_tracker()
+
+    # Red moves first; both our agents update the shared tracker, sometimes only one of them
+    expected = [(0, set()), (2, {1}), (0, {3}), (0, {1, 2, 3}), (2, {1})]
+    for observer, moved in expected:
+        assert tracker.moved_since_last_update(observer, 4) == moved
+        tracker.last_observer = observer
+
+    _, blue_tracker = make_tracker()
+    assert blue_tracker.moved_since_last_update(1, 4) == {0}
+
+
+def test_beliefs_follow_unseen_enemies_from_their_sonar_readings():
+    map_model, tracker = make_tracker()
+    rng = random.Random(3)
+    enemies = dict(ENEMY_SPAWNS)
+    in_sight = {cell for cell, position in enumerate(map_model.open_cells) if min(manhattan(position.to_tuple(), team) for team in TEAM_POSITIONS) <= BeliefTracker.SIGHT_RANGE}
+
+    for turn in range(60):
+        observer = 0 if turn % 2 == 0 else 2
+        observer_position = TEAM_POSITIONS[observer // 2]
+        readings = [None] * 4
+        for index, position in enemies.items():
+            readings[index] = manhattan(observer_position, position) + rng.randint(-BeliefTracker.SONAR_NOISE, BeliefTracker.SONAR_NOISE)
+
+        tracker.update(SonarGameState(readings), [observer_position, TEAM_POSITIONS[1 - observer // 2]], observer)
+
+        for index, position in enemies.items():
+            belief = tracker.beliefs[index]
+            assert belief.sum() == pytest.approx(1.0)
+            assert belief[map_model.get_open_index(Position.from_tuple(position))] > 0
+            assert not belief[sorted(in_sight)].any()
+
+        # The enemy after this observer takes its turn, staying out of sight on its own half
+        mover = observer + 1
+        options = [neighbor.to_tuple() for neighbor in map_model.get_neighbors(Position.from_tuple(enemies[mover])) if neighbor.x >= 10]
+        enemies[mover] = rng.choice(options + [enemies[mover]])
+
+
+def test_seen_enemies_are_certain_and_lost_ones_restart_at_their_spawn():
+    map_model, tracker = make_tracker()
+    seen = (5, 5)
+    spawn = ENEMY_SPAWNS[3]
+
+    # Enemy 3 believed right next to us but not in sight means it was eaten and respawned
+    tracker.beliefs[3] = tracker._certain(map_model.get_open_index(Position(3, 3)))
+    readings = [None, None, None, manhattan(TEAM_POSITIONS[0], spawn)]
+    tracker.update(SonarGameState(readings, {1: seen}), TEAM_POSITIONS, 0)
+
+    assert tracker.most_likely(1) == (Position(*seen), 1.0)
+    assert tracker.most_likely(3) == (Position(*spawn), 1.0)
@@ -0,0 +1,10 @@
+from brute_force import breadth_first
+
+
+def test_distance_table_matches_breadth_first_search(layout):
+    map_model, distances, _ = layout
+    size = distances.size
+
+    for start in range(size):
+        expected = breadth_first(map_model, start)
+        assert [distances.distances[start * size + cell] for cell in range(size)] == [expected[cell] for cell in range(size)]
@@ -0,0 +1,31 @@
+from my_team import ChangeEvent, FoodIndex
+
+
+def test_food_index_field_follows_food_events(layout):
+    map_model, distances, rng = layout
+    cells = map_model.open_cells
+    size = distances.size
+    index = FoodIndex(map_model, distances)
+    food = set()
+
+    for _ in range(100):
+        removed = set(rng.sample(sorted(food), min(len(food), rng.randrange(3))))
+        added = set(rng.sample(range(len(cells)), rng.randrange(3))) - food
+        events = [(ChangeEvent.FOOD_REMOVED, cells[cell].to_tuple()) for cell in removed]
+        events += [(ChangeEvent.FOOD_ADDED, cells[cell].to_tuple()) for cell in added]
+        food = (food - removed) | added
+
+        index.apply(events)
+        assert not index.apply(events)  # A teammate applying the same changes again is a no-op
+        assert index.food == food
+
+        for cell in range(0, len(cells), 3):
+            expected = min((distances.distances[cell * size + pellet] for pellet in food), default=None)
+            nearest = index.nearest(cells[cell])
+            if expected is None:
+                assert nearest is None
+                continue
+
+            assert nearest[1] == expected
+            path = index.path_from(cells[cell])
+            assert len(path) == expected and map_model.get_open_index(path[-1] if path else cells[cell]) in food
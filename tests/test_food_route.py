@@ -0,0 +1,41 @@
+from benchmarks import BenchmarkWalls
+from brute_force import walk
+from my_team import ChangeEvent, DistanceTable, FoodRoute, MapModel, Position
+
+
+def test_food_route_visits_every_pellet(layout):
+    map_model, distances, rng = layout
+    cells = map_model.open_cells
+    route = FoodRoute(map_model, distances)
+    food = set(rng.sample(range(len(cells)), len(cells) // 4))
+    start = rng.randrange(len(cells))
+
+    assert sorted(route.build(food, start)) == sorted(food)
+
+    route.apply([(ChangeEvent.FOOD_ADDED, cells[cell].to_tuple()) for cell in food], cells[start])
+    position = cells[start]
+    eaten = []
+
+    while route.next_target() is not None:
+        target = route.next_target()
+        path = route.path_from(position)
+        assert len(path) == distances.get_distance(position, target)
+        walk(map_model, map_model.get_open_index(position), path)
+
+        position = path[-1] if path else position
+        assert position == target
+        eaten.append(map_model.get_open_index(target))
+        route.apply([(ChangeEvent.FOOD_REMOVED, target.to_tuple())], position)
+
+    assert sorted(eaten) == sorted(food)
+
+
+def test_path_to_an_unreachable_pellet_is_empty():
+    walls = BenchmarkWalls(20, 10, 0, 1)
+    walls.data[10] = [True] * walls.height  # A wall column splits the map in two
+    map_model = MapModel(walls)
+    route = FoodRoute(map_model, DistanceTable(map_model))
+
+    route.apply([(ChangeEvent.FOOD_ADDED, (15, 5))], Position(15, 4))
+    assert route.next_target() == Position(15, 5)
+    assert route.path_from(Position(3, 3)) == []
@@ -0,0 +1,26 @@
+from benchmarks import BenchmarkGameState
+from my_team import GameSimulator, SimulatorState
+
+
+def test_simulator_undo_restores_every_ply(layout):
+    map_model, _, rng = layout
+    cells = map_model.open_cells
+    simulator = GameSimulator(map_model, BenchmarkGameState(cells))
+    food = sum(1 << cell for cell in range(len(cells)) if rng.random() < 0.4)
+    capsules = sum(1 << cell for cell in rng.sample(range(len(cells)), 4))
+
+    for _ in range(30):
+        state = SimulatorState(list(simulator.spawns), [0] * 4, [0] * 4, food, capsules, 0)
+        keys = []
+        records = []
+
+        for ply in range(40):
+            agent = ply % 4
+            keys.append(state.key())
+            legal = simulator.legal_moves(state, agent)
+            assert set(legal) == {state.positions[agent], *map_model.adjacency[state.positions[agent]]}
+            records.append(simulator.apply(state, agent, rng.choice(legal)))
+
+        for record, key in zip(reversed(records), reversed(keys)):
+            simulator.undo(state, record)
+            assert state.key() == key
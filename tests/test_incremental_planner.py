@@ -0,0 +1,36 @@
+from brute_force import dijkstra, random_costs, walk
+from my_team import IncrementalPlanner
+
+
+def test_incremental_planner_repairs_match_a_fresh_search(layout):
+    map_model, distances, rng = layout
+    cells = map_model.open_cells
+    planner = IncrementalPlanner(map_model, distances)
+    start = rng.randrange(len(cells))
+    goals = rng.sample(range(len(cells)), 3)
+
+    # Small moves of the start, the goals, the blocked cells and the costs, as between two turns
+    for _ in range(150):
+        start = rng.choice(map_model.adjacency[start] + (start,))
+        if rng.random() < 0.2:
+            goals = [rng.choice(map_model.adjacency[goal] + (goal,)) for goal in goals]
+        blocked = set(rng.sample(range(len(cells)), rng.randrange(4))) - {start}
+        costs = random_costs(rng, map_model)
+        step_costs = costs or [0] * len(cells)
+
+        path = planner.plan(cells[start], [cells[goal] for goal in goals], [cells[cell] for cell in blocked], None, costs)
+        if start in goals:
+            continue
+
+        reachable = dijkstra(map_model, start, step_costs, blocked)
+        expected = min((reachable[goal] for goal in goals if goal in reachable and goal not in blocked), default=None)
+
+        if expected is None:
+            assert path.is_empty()
+            continue
+
+        visited = walk(map_model, start, path.positions, blocked)
+        assert visited[-1] in goals
+        assert sum(1 + step_costs[cell] for cell in visited) == expected
+
+    assert planner.repairs > 0
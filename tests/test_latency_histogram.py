@@ -0,0 +1,46 @@
+import json
+import math
+import random
+
+from my_team import LatencyHistogram
+
+
+def random_latencies(seed, count):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(math.log(0.01), 1.0) for _ in range(count)]
+
+
+def histogram_of(latencies):
+    histogram = LatencyHistogram()
+    for seconds in latencies:
+        histogram.add(seconds)
+
+    return histogram
+
+
+def test_percentiles_are_within_one_bucket_of_the_exact_value():
+    latencies = random_latencies(1, 5_000)
+    histogram = histogram_of(latencies)
+    ordered = sorted(latencies)
+
+    for fraction in (0.01, 0.5, 0.9, 0.95, 0.99, 1.0):
+        exact = ordered[math.ceil(fraction * len(ordered)) - 1]
+        assert exact <= histogram.percentile(fraction) <= exact * LatencyHistogram.GROWTH
+
+    assert histogram.percentile(1.0) == max(latencies)
+    assert LatencyHistogram().percentile(0.5) == 0.0
+
+
+def test_merging_saved_states_equals_one_histogram_of_everything():
+    games = [random_latencies(seed, 500) for seed in range(3)]
+    merged = LatencyHistogram()
+    for latencies in games:
+        # Reports travel as JSON, which turns the bucket numbers into strings
+        merged.merge(LatencyHistogram.from_state(json.loads(json.dumps(histogram_of(latencies).to_state()))))
+
+    combined = histogram_of([seconds for latencies in games for seconds in latencies])
+    assert merged.counts == combined.counts
+    assert merged.count == combined.count == 1_500
+    assert math.isclose(merged.total, combined.total)
+    assert merged.maximum == combined.maximum
+    assert merged.summary() == combined.summary()
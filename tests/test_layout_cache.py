@@ -0,0 +1,69 @@
+import os
+
+from benchmarks import BenchmarkWalls
+from my_team import DistanceTable, LayoutCache, MapModel
+
+
+def make_map(seed, width=16, height=8):
+    return MapModel(BenchmarkWalls(width, height, 0.2, seed))
+
+
+def test_a_stored_layout_loads_back_unchanged(tmp_path):
+    cache = LayoutCache(str(tmp_path))
+    map_model = make_map(1)
+
+    built = cache.get_distance_table(map_model)
+    assert os.path.exists(cache.get_path(map_model))
+
+    loaded = cache.get_distance_table(map_model)
+    assert list(loaded.distances) == list(built.distances) == list(DistanceTable(map_model).distances)
+
+
+def test_layouts_with_other_walls_get_other_entries(tmp_path):
+    cache = LayoutCache(str(tmp_path))
+    first, second = make_map(1), make_map(2)
+
+    cache.store(first, DistanceTable(first))
+    assert cache.get_path(first) != cache.get_path(second)
+    assert cache.load(second) is None
+
+
+def test_corrupt_or_foreign_entries_are_ignored(tmp_path):
+    cache = LayoutCache(str(tmp_path))
+    map_model = make_map(1)
+    table = DistanceTable(map_model)
+    path = cache.get_path(map_model)
+
+    cache.store(map_model, table)
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 2)
+    assert cache.load(map_model) is None
+
+    with open(path, "wb") as file:
+        file.write(LayoutCache.HEADER.pack(LayoutCache.MAGIC, LayoutCache.VERSION + 1, map_model.width, map_model.height, table.size))
+        file.write(table.distances.tobytes())
+    assert cache.load(map_model) is None
+
+    # A miss rebuilds the table and replaces the bad entry
+    assert list(cache.get_distance_table(map_model).distances) == list(table.distances)
+    assert list(cache.load(map_model)) == list(table.distances)
+
+
+def test_eviction_drops_old_formats_and_least_recently_used_entries(tmp_path):
+    maps = [make_map(seed) for seed in range(3)]
+    cache = LayoutCache(str(tmp_path))
+    old_format = tmp_path / f"stale.v{LayoutCache.VERSION - 1}{LayoutCache.SUFFIX}"
+    old_format.write_bytes(b"old")
+
+    for age, map_model in enumerate(maps):
+        cache.store(map_model, DistanceTable(map_model))
+        os.utime(cache.get_path(map_model), (1_000_000 + age, 1_000_000 + age))
+
+    assert not old_format.exists()
+
+    # Loading marks an entry as recently used, so the oldest untouched one goes first
+    cache.load(maps[0])
+    cache.max_bytes = os.path.getsize(cache.get_path(maps[0])) + os.path.getsize(cache.get_path(maps[2]))
+    cache.evict()
+
+    assert [os.path.exists(cache.get_path(map_model)) for map_model in maps] == [True, False, True]
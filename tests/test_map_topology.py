@@ -0,0 +1,26 @@
+from brute_force import breadth_first
+from my_team import MapTopology
+
+
+def test_map_topology_matches_brute_force(layout):
+    map_model, distances, _ = layout
+    cells = map_model.open_cells
+    topology = MapTopology(map_model)
+
+    for cell in range(len(cells)):
+        others = next(other for other in range(len(cells)) if other != cell)
+        disconnects = len(breadth_first(map_model, others, {cell})) < len(cells) - 1
+        assert bool(topology.articulation[cell]) == disconnects
+
+    core = {cell for cell in range(len(cells)) if topology.dead_end_depth[cell] == 0}
+    for cell in range(len(cells)):
+        exit_cell = topology.exits[cell]
+        if cell in core:
+            assert exit_cell == cell
+            assert sum(neighbor in core for neighbor in map_model.adjacency[cell]) >= 2
+            continue
+
+        # Every way out of a dead end leads through its exit, a core cell depth steps away
+        assert exit_cell in core
+        assert distances.distances[cell * distances.size + exit_cell] == topology.dead_end_depth[cell]
+        assert not core & set(breadth_first(map_model, cell, {exit_cell}))
@@ -0,0 +1,50 @@
+from benchmarks import BenchmarkGameData
+from brute_force import dijkstra, random_costs, walk
+from my_team import PositionPath
+
+
+def test_a_star_finds_cheapest_paths_around_restricted_cells(layout):
+    map_model, _, rng = layout
+    cells = map_model.open_cells
+
+    for _ in range(200):
+        start, end = rng.sample(range(len(cells)), 2)
+        blocked = set(rng.sample(range(len(cells)), 6)) - {start, end}
+        costs = random_costs(rng, map_model)
+        step_costs = costs or [0] * len(cells)
+
+        path = PositionPath(BenchmarkGameData(map_model, cells[start]), cells[start], cells[end], [cells[cell] for cell in blocked], costs)
+        expected = dijkstra(map_model, start, step_costs, blocked).get(end)
+
+        if expected is None:
+            assert path.is_empty()
+            continue
+
+        visited = walk(map_model, start, path.positions, blocked)
+        assert not path.partial and visited[-1] == end
+        assert sum(1 + step_costs[cell] for cell in visited) == expected
+
+
+def test_nearest_search_reaches_the_closest_target(layout):
+    map_model, _, rng = layout
+    cells = map_model.open_cells
+
+    for _ in range(200):
+        start = rng.randrange(len(cells))
+        targets = set(rng.sample(range(len(cells)), 4)) - {start}
+        blocked = set(rng.sample(range(len(cells)), 6)) - {start} - targets
+        costs = random_costs(rng, map_model)
+        step_costs = costs or [0] * len(cells)
+
+        game_data = BenchmarkGameData(map_model, cells[start])
+        path = PositionPath.to_nearest(game_data, cells[start], [cells[cell] for cell in targets], [cells[cell] for cell in blocked], costs)
+        reachable = dijkstra(map_model, start, step_costs, blocked)
+        expected = min((reachable[cell] for cell in targets if cell in reachable), default=None)
+
+        if expected is None:
+            assert path.is_empty()
+            continue
+
+        visited = walk(map_model, start, path.positions, blocked)
+        assert visited[-1] in targets
+        assert sum(1 + step_costs[cell] for cell in visited) == expected
@@ -0,0 +1,20 @@
+from my_team import Profiler
+
+
+def test_each_game_reports_only_its_own_data(capsys, tmp_path):
+    trace_path = tmp_path / "trace.folded"
+    profiler = Profiler(str(trace_path))
+
+    for game, calls in enumerate((3, 1)):
+        profiler.game_started()
+        profiler.game_started()  # Every agent registers
+        for _ in range(calls):
+            profiler.count("food_index.nearest")
+            profiler.enter(f"game{game}")
+            profiler.exit()
+
+        assert profiler.summary()["counters"] == {"food_index.nearest": calls}
+        profiler.report()
+        profiler.report()  # Only the first agent's final() prints
+        assert capsys.readouterr().out.count('"counters"') == 1
+        assert [line.split()[0] for line in trace_path.read_text().splitlines()] == [f"game{game}"]
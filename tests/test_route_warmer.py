@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from benchmarks import BenchmarkWalls
+from my_team import DistanceTable, FoodRoute, MapModel, RouteWarmer
+
+
+@pytest.fixture
+def route():
+    map_model = MapModel(BenchmarkWalls(24, 12, 0.2, 4))
+    return FoodRoute(map_model, DistanceTable(map_model))
+
+
+@pytest.fixture
+def warmer(route):
+    warmer = RouteWarmer.start(route)
+    if warmer is None:
+        pytest.skip("the route warmer needs fork")
+
+    yield warmer
+    warmer.close()
+
+
+def wait_for_answers(warmer, count, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while len(warmer.plans) < count and time.monotonic() < deadline:
+        warmer.receive()
+        time.sleep(0.01)
+
+    assert len(warmer.plans) == count
+
+
+def test_answers_only_match_their_exact_request(route, warmer):
+    food = frozenset(range(0, len(route.map_model.open_cells), 4))
+    requests = [(1, food), (2, food - {8})]
+
+    warmer.submit(requests)
+    wait_for_answers(warmer, len(requests))
+
+    assert warmer.take(set(food), 3) is None  # Another start
+    assert warmer.take(set(food) - {4}, 1) is None  # Other pellets
+    assert warmer.take(set(food), 1) == route.build(food, 1)
+    assert warmer.take(set(food), 1) is None  # Each answer is used once
+    assert warmer.take(set(food) - {8}, 2) == route.build(food - {8}, 2)
+
+
+def test_a_new_request_discards_earlier_answers(route, warmer):
+    food = frozenset(range(0, len(route.map_model.open_cells), 5))
+
+    warmer.submit([(1, food)])
+    wait_for_answers(warmer, 1)
+    warmer.submit([(2, food)])
+    wait_for_answers(warmer, 1)
+
+    assert warmer.take(set(food), 1) is None
+    assert warmer.take(set(food), 2) == route.build(food, 2)
+
+
+def test_a_closed_warmer_answers_nothing(route, warmer):
+    food = frozenset(range(0, len(route.map_model.open_cells), 3))
+
+    warmer.close()
+    warmer.submit([(1, food)])
+    assert warmer.take(set(food), 1) is None
+    assert not warmer.process.is_alive()
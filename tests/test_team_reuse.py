@@ -0,0 +1,55 @@
+"""The contest reuses the same agent objects for every game of a match, so nothing may outlive its layout."""
+import os
+
+from contest import capture
+
+from benchmarks import BenchmarkWalls
+
+TEAM_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "my_team.py")
+
+
+def write_layout(directory, name, width, height, seed):
+    walls = BenchmarkWalls(width, height, 0.2, seed)
+    cells = sorted((x, y) for x in range(width) for y in range(height) if not walls[x][y])
+    rows = [["%" if walls[x][y] else " " for x in range(width)] for y in range(height)]
+
+    for x, y in cells[2::3]:
+        rows[y][x] = "."
+    for char, (x, y) in zip("13", cells):
+        rows[y][x] = char
+        rows[height - 1 - y][width - 1 - x] = str(int(char) + 1)
+    rows[cells[len(cells) // 4][1]][cells[len(cells) // 4][0]] = "o"
+
+    path = os.path.join(directory, f"{name}.lay")
+    with open(path, "w") as file:
+        file.write("\n".join("".join(row) for row in reversed(rows)) + "\n")
+
+    return path
+
+
+def test_agents_play_a_second_layout_of_another_size(tmp_path):
+    layouts = [write_layout(tmp_path, "large", 34, 18, 5), write_layout(tmp_path, "small", 20, 10, 3)]
+    options = capture.read_command(["-r", TEAM_PATH, "-b", TEAM_PATH, "-l", layouts[0], "-n", "1", "-i", "200", "-Q"])
+    agents = options["agents"]
+    capture.run_games(**options)
+
+    positions = {agent.index: set() for agent in agents}
+    for agent in agents:
+        def choose_action(game_state, agent=agent, choose=agent.choose_action):
+            positions[agent.index].add(game_state.get_agent_position(agent.index))
+            return choose(game_state)
+
+        agent.choose_action = choose_action
+
+    second = capture.read_command(["-r", TEAM_PATH, "-b", TEAM_PATH, "-l", layouts[1], "-n", "1", "-i", "200", "-Q"])
+    capture.run_games(**{**options, "layouts": second["layouts"]})
+
+    # The contest loads the team file as its own module, so agents are recognised by their interpreter
+    for agent in filter(lambda agent: hasattr(agent, "interpreter"), agents):
+        interpreter = agent.interpreter
+        assert agent.map_model.width == 20
+        assert interpreter.map_model is agent.knowledge.map_model
+        assert all(goal.planner.map_model is agent.map_model for goal in interpreter.allowed_goals)
+        if interpreter.collects_food:
+            assert interpreter.food_route.map_model is agent.map_model
+            assert len(positions[agent.index]) > 1